@@ -0,0 +1,124 @@
+import os
+import sqlite3
+
+# Índice persistente de las etiquetas de búsqueda (título, artista y álbum en minúsculas) de
+# cada archivo, guardadas junto a su mtime. Al reabrir el reproductor, la búsqueda toma de aquí
+# las etiquetas de los archivos que no han cambiado en lugar de volver a leerlos con mutagen.
+# También guarda la duración de cada archivo con su mtime y tamaño, para que la playlist no
+# vuelva a abrir la cabecera con soundfile al añadir de nuevo una carpeta ya vista.
+# Las firmas (mtime en ns, tamaño) las toman los workers antes de leer cada archivo y se reciben
+# ya calculadas, así lo guardado corresponde a lo que se leyó y no a un stat posterior. Las filas
+# de versiones anteriores, con el mtime en segundos, no coinciden y se vuelven a leer una vez.
+
+_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS tracks (
+        path TEXT PRIMARY KEY,
+        mtime INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        artist TEXT NOT NULL,
+        album TEXT NOT NULL
+    )
+"""
+
+_ESQUEMA_DURACIONES = """
+    CREATE TABLE IF NOT EXISTS durations (
+        path TEXT PRIMARY KEY,
+        mtime INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        duration_ms INTEGER NOT NULL
+    )
+"""
+
+# Parámetros por consulta "IN (...)"; las versiones antiguas de SQLite admiten como máximo 999
+_MAX_PARAMETROS = 900
+
+
+def firma(ruta):
+    """(mtime en ns, tamaño) del archivo, o None si no se puede consultar."""
+    try:
+        return firma_estado(os.stat(ruta))
+    except OSError:
+        return None
+
+
+def firma_estado(estado):
+    """Firma de un os.stat_result ya obtenido, p. ej. el de DirEntry.stat() al escanear."""
+    return estado.st_mtime_ns, estado.st_size
+
+
+class BibliotecaEtiquetas:
+    def __init__(self, ruta_db):
+        directorio = os.path.dirname(ruta_db)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._conexion = sqlite3.connect(ruta_db)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute(_ESQUEMA)
+        self._conexion.execute(_ESQUEMA_DURACIONES)
+        self._conexion.commit()
+
+    def cargar(self, firmas):
+        """
+        Recibe {ruta: firma} y devuelve {ruta: (título, artista, álbum)} para las rutas guardadas
+        cuyo mtime coincide con el de su firma. Las que falten deben leerse de nuevo del archivo.
+        """
+        rutas = [ruta for ruta, firma_actual in firmas.items() if firma_actual is not None]
+        etiquetas = {}
+        for inicio in range(0, len(rutas), _MAX_PARAMETROS):
+            lote = rutas[inicio:inicio + _MAX_PARAMETROS]
+            marcadores = ",".join("?" * len(lote))
+            filas = self._conexion.execute(
+                f"SELECT path, mtime, title, artist, album FROM tracks WHERE path IN ({marcadores})", lote)
+            for ruta, mtime, titulo, artista, album in filas:
+                if firmas[ruta][0] == mtime:
+                    etiquetas[ruta] = (titulo, artista, album)
+        return etiquetas
+
+    def guardar(self, etiquetas, firmas):
+        """Guarda o actualiza {ruta: (título, artista, álbum)} con el mtime de la firma de cada archivo."""
+        filas = []
+        for ruta, (titulo, artista, album) in etiquetas.items():
+            firma_lectura = firmas.get(ruta)
+            if firma_lectura is not None:
+                filas.append((ruta, firma_lectura[0], titulo, artista, album))
+        if not filas:
+            return
+        with self._conexion: # Una sola transacción por lote
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO tracks (path, mtime, title, artist, album) VALUES (?, ?, ?, ?, ?)",
+                filas)
+
+    def cargar_duraciones(self, firmas):
+        """
+        Recibe {ruta: firma} y devuelve {ruta: duración en ms} para las rutas guardadas con la
+        misma firma (mtime en ns y tamaño). Las que falten deben leerse de nuevo del archivo.
+        """
+        rutas = [ruta for ruta, firma_actual in firmas.items() if firma_actual is not None]
+        duraciones = {}
+        for inicio in range(0, len(rutas), _MAX_PARAMETROS):
+            lote = rutas[inicio:inicio + _MAX_PARAMETROS]
+            marcadores = ",".join("?" * len(lote))
+            filas = self._conexion.execute(
+                f"SELECT path, mtime, size, duration_ms FROM durations WHERE path IN ({marcadores})", lote)
+            for ruta, mtime, tamano, duracion_ms in filas:
+                if firmas[ruta] == (mtime, tamano):
+                    duraciones[ruta] = duracion_ms
+        return duraciones
+
+    def guardar_duraciones(self, duraciones, firmas):
+        """Guarda o actualiza {ruta: duración en ms} con la firma (mtime, tamaño) de cada archivo."""
+        filas = []
+        for ruta, duracion_ms in duraciones.items():
+            firma_lectura = firmas.get(ruta)
+            if firma_lectura is not None:
+                filas.append((ruta, firma_lectura[0], firma_lectura[1], duracion_ms))
+        if not filas:
+            return
+        with self._conexion: # Una sola transacción por lote
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO durations (path, mtime, size, duration_ms) VALUES (?, ?, ?, ?)",
+                filas)
+
+    def cerrar(self):
+        self._conexion.close()
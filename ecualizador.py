@@ -1,18 +1,303 @@
 import sys
+import logging
 import numpy as np
-import traceback # Para el gancho de excepciones
 from PyQt6.QtWidgets import (
     QApplication, QDialog, QVBoxLayout, QHBoxLayout,
     QSlider, QLabel, QPushButton, QStyle, QLineEdit, QSpacerItem, QSizePolicy, QComboBox
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QTimer # Importar QTimer
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer, QSignalBlocker # Importar QTimer
 from PyQt6.QtGui import QPalette, QColor, QFont # Importar QFont
 
+log = logging.getLogger(__name__)
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # Sin Numba las funciones decoradas se ejecutan como Python normal
+    NUMBA_AVAILABLE = False
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+    prange = range
+
+# Hoja de estilos del ecualizador. Se define una sola vez a nivel de módulo para que todas
+# las instancias del diálogo compartan el mismo objeto en lugar de reconstruir el literal.
+_EQ_STYLESHEET = """
+    QDialog {
+        background-color: #1a1a1a;
+        border-radius: 10px;
+    }
+    QLabel {
+        color: #ddd;
+        font-size: 13px;
+    }
+    QSlider::groove:vertical {
+        width: 8px;
+        background: #555;
+        border-radius: 4px;
+    }
+    QSlider::handle:vertical {
+        width: 16px;
+        height: 16px;
+        background: #50b8f0;
+        border-radius: 8px;
+        margin: 0 -4px; /* Centrar el handle */
+    }
+    QSlider::add-page:vertical {
+        background: #888; /* Color de la parte "sin rellenar" del slider */
+    }
+    QSlider::sub-page:vertical {
+        background: #50b8f0; /* Color de la parte "rellenada" del slider */
+    }
+    QPushButton {
+        background: #333;
+        border: none;
+        border-radius: 8px;
+        padding: 8px 12px;
+        color: white;
+        font-size: 13px;
+        min-width: 60px;
+    }
+    QPushButton:hover {
+        background: #444;
+    }
+    QPushButton:pressed {
+        background: #222;
+    }
+    QComboBox {
+        background-color: #2b2b2b;
+        border: 1px solid #444;
+        border-radius: 5px;
+        padding: 5px;
+        color: #ddd;
+        font-size: 13px;
+        selection-background-color: #50b8f0; /* Color de fondo al seleccionar */
+        selection-color: black; /* Color del texto al seleccionar */
+    }
+    QComboBox::drop-down {
+        subcontrol-origin: padding;
+        subcontrol-position: top right;
+        width: 20px;
+        border-left-width: 1px;
+        border-left-color: #444;
+        border-left-style: solid; /* just a line */
+        border-top-right-radius: 3px; /* same radius as the QComboBox */
+        border-bottom-right-radius: 3px;
+    }
+    QComboBox::down-arrow {
+        image: url(data:image/svg+xml;base66,PHN2ZyB2aWV3Qm94PSIwIDAgMTAgNiIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48cGF0aCBkPSJNNi43MDcgNC4yOTNMMiA4LjgyOEwwIDYuMTIyTDUuNDQ0NDQgMS42NzdMMiA1LjQ0NDQ0TDYgOS40NDQ0NEwxMCA1LjQ0NDQ0TDUgMFoiLz48L3N2Zz4=); /* Pequeña flecha SVG hacia abajo */
+        width: 12px;
+        height: 12px;
+    }
+    QComboBox QAbstractItemView {
+        background-color: #2b2b2b;
+        border: 1px solid #444;
+        border-radius: 5px;
+        selection-background-color: #50b8f0;
+        selection-color: black;
+        color: #ddd;
+    }
+"""
+
+# Paleta oscura compartida por todas las instancias del diálogo. QPalette requiere que
+# QApplication ya exista, así que se construye de forma perezosa en el primer uso.
+_dark_palette = None
+
+def _get_dark_palette():
+    """Devuelve la paleta oscura, creándola solo la primera vez."""
+    global _dark_palette
+    if _dark_palette is None:
+        pal = QPalette()
+        pal.setColor(QPalette.ColorRole.Window, QColor(25, 25, 25))
+        pal.setColor(QPalette.ColorRole.WindowText, Qt.GlobalColor.white)
+        pal.setColor(QPalette.ColorRole.Base, QColor(35, 35, 35))
+        pal.setColor(QPalette.ColorRole.AlternateBase, QColor(45, 45, 45))
+        pal.setColor(QPalette.ColorRole.Text, Qt.GlobalColor.white)
+        pal.setColor(QPalette.ColorRole.Button, QColor(35, 35, 35))
+        pal.setColor(QPalette.ColorRole.ButtonText, Qt.GlobalColor.white)
+        pal.setColor(QPalette.ColorRole.Highlight, QColor(80, 160, 220))
+        pal.setColor(QPalette.ColorRole.HighlightedText, Qt.GlobalColor.black)
+        _dark_palette = pal
+    return _dark_palette
+
+# Frecuencias de banda para un ecualizador de 10 bandas (octavas)
+# Basado en el estándar de ecualizadores gráficos (ISO 266)
+BAND_FREQUENCIES = (31, 62, 125, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# Definición de presets de ecualizador
+# Los valores están en dB y deben estar dentro del rango [-12, 12]
+_PRESETS = {
+    'Plano': (0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+    'Pop': (2, 4, 3, 1, 0, 1, 2, 3, 2, 1),
+    'Rock': (3, 4, 2, 0, -2, 0, 2, 4, 5, 3),
+    'Jazz': (1, 2, 1, 0, 0, 0, 1, 2, 1, 0),
+    'Trova': (-2, -3, -1, 0, 1, 2, 3, 2, 1, 0),
+    'Clásica': (1, 2, 2, 0, -1, -1, 0, 2, 3, 2),
+    'Voz': (-3, -4, -2, 2, 4, 5, 3, 1, -1, -2),
+    'Bajo Pesado': (6, 5, 3, 1, 0, -1, -2, -3, -4, -5),
+    'Agudos Claros': (-3, -2, -1, 0, 1, 2, 3, 4, 5, 6),
+    'Acústica': (2, 3, 1, -1, -2, -1, 0, 2, 3, 2),
+    'Dance': (4, 5, 3, 0, -2, 0, 2, 4, 5, 6),
+    'Hall': (1, 2, 3, 2, 1, 0, -1, -2, -3, -4),
+    'En Vivo': (-1, -2, -3, -1, 0, 1, 2, 3, 4, 5),
+}
+
+# Matriz (n_presets, n_bandas) para comparar la configuración actual contra todos
+# los presets en una sola operación vectorizada. Se usa float porque las ganancias
+# de los sliders tienen pasos de 0.1 dB y no deben truncarse al comparar.
+_PRESET_NAMES = tuple(_PRESETS)
+_PRESET_MATRIX = np.array([_PRESETS[name] for name in _PRESET_NAMES], dtype=np.float64)
+_PRESET_MATRIX.setflags(write=False)
+
+def peaking_band_trig(freqs, qs, fs):
+    """
+    Parte de los filtros peaking que no depende de la ganancia: cos(w0) y alpha por banda.
+    Solo cambia con la frecuencia de muestreo, así que quien rediseña los filtros al mover las
+    ganancias puede calcularla una vez y pasarla a peaking_coeffs_from_trig.
+    """
+    w0 = 2.0 * np.pi * np.asarray(freqs, dtype=np.float64) / fs
+    return np.cos(w0), np.sin(w0) / (2.0 * np.asarray(qs, dtype=np.float64))
+
+# Los kernels se declaran con firmas explícitas para que Numba los compile (o los cargue de la
+# caché) al importar el módulo, en lugar de en su primera llamada, que para sos_cascade sería
+# dentro del hilo de audio. Una llamada con tipos no declarados lanza TypeError en vez de compilar.
+@njit("float64[:, ::1](float64[:], float64[:], float64[:])", cache=True, fastmath=True)
+def peaking_coeffs_from_trig(cos_w0, alpha, gains_db):
+    """
+    Coeficientes peaking (RBJ Audio EQ Cookbook) a partir de cos(w0) y alpha ya calculados
+    (ver peaking_band_trig), sin trigonometría. Mismo formato que biquad_peaking_coeffs.
+    """
+    n = cos_w0.shape[0]
+    coeffs = np.empty((n, 6), dtype=np.float64)
+    for i in range(n):
+        A = 10.0 ** (gains_db[i] / 40.0)
+        a0 = 1.0 + alpha[i] / A
+        coeffs[i, 0] = (1.0 + alpha[i] * A) / a0
+        coeffs[i, 1] = (-2.0 * cos_w0[i]) / a0
+        coeffs[i, 2] = (1.0 - alpha[i] * A) / a0
+        coeffs[i, 3] = 1.0
+        coeffs[i, 4] = (-2.0 * cos_w0[i]) / a0
+        coeffs[i, 5] = (1.0 - alpha[i] / A) / a0
+    return coeffs
+
+@njit("float64[:, ::1](float64[:], float64[:], float64[:], float64)", cache=True, fastmath=True)
+def biquad_peaking_coeffs(freqs, qs, gains_db, fs):
+    """
+    Calcula los coeficientes de filtros peaking (RBJ Audio EQ Cookbook) para todas las bandas.
+    Retorna un array (n_bandas, 6) con b0, b1, b2, a0, a1, a2 por fila, normalizado por a0
+    (a0 = 1), que es el formato de secciones de segundo orden (SOS) de SciPy.
+    """
+    w0 = 2.0 * np.pi * freqs / fs
+    return peaking_coeffs_from_trig(np.cos(w0), np.sin(w0) / (2.0 * qs), gains_db)
+
+# Como resample_block: sin GIL y con un canal por hilo de Numba. Cada canal solo escribe su
+# columna de x y su estado zi[:, :, c], y el estado se guarda en variables locales durante el
+# bloque, así que los hilos no comparten escrituras salvo una por sección al terminar.
+# El bloque del hilo de reproducción siempre es float32 contiguo: con esa firma Numba conoce
+# el paso entre muestras y no lo lee del array en cada acceso. boundscheck=False se indica
+# explícitamente para que NUMBA_BOUNDSCHECK en el entorno no añada comprobaciones a este bucle.
+@njit(["void(float64[:, ::1], float64[:, :, ::1], float32[:, ::1])",
+       "void(float64[:, :], float64[:, :, :], float32[:, :])",
+       "void(float64[:, :], float64[:, :, :], float64[:, :])"],
+      cache=True, fastmath=True, nogil=True, parallel=True, boundscheck=False)
+def sos_cascade(sos, zi, x):
+    """
+    Aplica en el sitio la cascada de biquads sos (n_secciones, 6), con filas en el formato de
+    biquad_peaking_coeffs, a x (n_muestras, n_canales). Usa la forma directa II transpuesta,
+    igual que scipy.signal.lfilter, así que zi (n_secciones, 2, n_canales) es el mismo estado
+    que lfilter usaría por banda y canal; se actualiza para continuar en el siguiente bloque.
+    """
+    n_sections = sos.shape[0]
+    n_samples, n_channels = x.shape
+    for c in prange(n_channels):
+        for s in range(n_sections):
+            b0 = sos[s, 0]
+            b1 = sos[s, 1]
+            b2 = sos[s, 2]
+            a1 = sos[s, 4]
+            a2 = sos[s, 5]
+            z1 = zi[s, 0, c]
+            z2 = zi[s, 1, c]
+            for n in range(n_samples):
+                xn = x[n, c]
+                yn = b0 * xn + z1
+                z1 = b1 * xn - a1 * yn + z2
+                z2 = b2 * xn - a2 * yn
+                x[n, c] = yn
+            zi[s, 0, c] = z1
+            zi[s, 1, c] = z2
+
+# nogil: el hilo de reproducción no retiene el GIL mientras remuestrea, así la UI sigue
+# respondiendo; parallel: cada canal se calcula en un hilo de Numba distinto (prange)
+@njit("void(float32[:, :], float64, float64, float64[:], float64[:], int64, float64, float32[:, :])",
+      cache=True, fastmath=True, nogil=True, parallel=True, boundscheck=False)
+def resample_block(x, t0, step, interp_win, interp_delta, num_table, scale, y):
+    """
+    Remuestreo por sinc con ventana de Kaiser (el bucle de resampy). Escribe en y (n_salida,
+    n_canales) las muestras de x (n_muestras, n_canales) interpoladas en los instantes
+    t0 + t * step, medidos en muestras de x. interp_win es la mitad derecha del filtro, con
+    num_table puntos por cruce por cero y ya multiplicada por scale (min(1, fs_salida / fs_entrada));
+    interp_delta son sus diferencias para interpolar entre puntos. Fuera de x se toma 0.
+    """
+    n_x, n_channels = x.shape
+    n_win = interp_win.shape[0]
+    index_step = int(scale * num_table)
+    for c in prange(n_channels):
+        for t in range(y.shape[0]):
+            time = t0 + t * step
+            n = int(time)
+            acc = 0.0
+
+            # Ala izquierda: x[n], x[n - 1], ...
+            frac = scale * (time - n)
+            index_frac = frac * num_table
+            offset = int(index_frac)
+            eta = index_frac - offset
+            i_min = max(0, n - n_x + 1)
+            i_max = min(n + 1, (n_win - offset) // index_step)
+            for i in range(i_min, i_max):
+                k = offset + i * index_step
+                acc += (interp_win[k] + eta * interp_delta[k]) * x[n - i, c]
+
+            # Ala derecha: x[n + 1], x[n + 2], ...
+            frac = scale - frac
+            index_frac = frac * num_table
+            offset = int(index_frac)
+            eta = index_frac - offset
+            i_min = max(0, -n - 1)
+            i_max = min(n_x - n - 1, (n_win - offset) // index_step)
+            for i in range(i_min, i_max):
+                k = offset + i * index_step
+                acc += (interp_win[k] + eta * interp_delta[k]) * x[n + i + 1, c]
+
+            y[t, c] = acc
+
+@njit(["void(float32[:, ::1], float32)", "void(float32[:, :], float32)"],
+      cache=True, fastmath=True, nogil=True, boundscheck=False)
+def scale_inplace(buf, gain):
+    """Multiplica buf (n_muestras, n_canales) por gain en el sitio, sin crear otro array."""
+    n_samples, n_channels = buf.shape
+    for n in range(n_samples):
+        for c in range(n_channels):
+            buf[n, c] *= gain
+
+@njit("void(float32[:], float32[:])", cache=True)
+def sanitize_finite(dst, src):
+    """Copia src en dst (ya reservado, mismo tamaño) cambiando NaN e infinitos por 0."""
+    for i in range(src.size):
+        v = src[i]
+        if v != v or v == np.inf or v == -np.inf:
+            dst[i] = 0.0
+        else:
+            dst[i] = v
+
 class EqualizerWindow(QDialog):
     # Señal que se emite cuando los parámetros del ecualizador cambian y se aplican.
-    # Emite un diccionario con 'band_idx': {'gain': value, 'q': value, 'freq': value}
+    # Emite un np.ndarray float32 de forma (n_bandas, 3) con columnas gain (dB), q y freq (Hz)
     # ESTA SEÑAL SOLO SE EMITIRÁ CUANDO SE PRESIONE "APLICAR"
-    eq_params_changed = pyqtSignal(dict)
+    eq_params_changed = pyqtSignal(np.ndarray)
 
     def __init__(self, parent=None, initial_settings=None):
         super().__init__(parent)
@@ -22,135 +307,65 @@ class EqualizerWindow(QDialog):
         self.set_dark_theme()
         self.apply_styles()
 
-        self.eq_bands = {} # {index: {'slider': QSlider, 'label': QLabel, 'gain': float, 'q': float, 'freq': float}}
         self.min_gain = -12.0 # -12 dB
         self.max_gain = 12.0  # +12 dB
         self.default_q = 1.0 # Factor Q predeterminado
+
+        # Textos de las etiquetas de ganancia precalculados para cada posición del slider
+        # (pasos de 0.1 dB), así el arrastre no formatea un float en cada paso.
+        self._db_label_cache = {
+            value: f"{value / 10.0:.1f} dB"
+            for value in range(int(self.min_gain * 10), int(self.max_gain * 10) + 1)
+        }
         
-        # Frecuencias de banda para un ecualizador de 10 bandas (octavas)
-        # Basado en el estándar de ecualizadores gráficos (ISO 266)
-        self.band_frequencies = [31, 62, 125, 250, 500, 1000, 2000, 4000, 8000, 16000]
-
-        # Definición de presets de ecualizador
-        # Los valores están en dB y deben estar dentro del rango [-12, 12]
-        self.presets = {
-            'Plano': [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            'Pop': [2, 4, 3, 1, 0, 1, 2, 3, 2, 1],
-            'Rock': [3, 4, 2, 0, -2, 0, 2, 4, 5, 3],
-            'Jazz': [1, 2, 1, 0, 0, 0, 1, 2, 1, 0],
-            'Trova': [-2, -3, -1, 0, 1, 2, 3, 2, 1, 0],
-            'Clásica': [1, 2, 2, 0, -1, -1, 0, 2, 3, 2],
-            'Voz': [-3, -4, -2, 2, 4, 5, 3, 1, -1, -2],
-            'Bajo Pesado': [6, 5, 3, 1, 0, -1, -2, -3, -4, -5],
-            'Agudos Claros': [-3, -2, -1, 0, 1, 2, 3, 4, 5, 6],
-            'Acústica': [2, 3, 1, -1, -2, -1, 0, 2, 3, 2],
-            'Dance': [4, 5, 3, 0, -2, 0, 2, 4, 5, 6],
-            'Hall': [1, 2, 3, 2, 1, 0, -1, -2, -3, -4],
-            'En Vivo': [-1, -2, -3, -1, 0, 1, 2, 3, 4, 5],
+        self.band_frequencies = BAND_FREQUENCIES
+
+        # Estado de las bandas como arrays paralelos (uno por parámetro) para que el DSP
+        # pueda leerlos directamente. Se usa float64 para que las ganancias en pasos de
+        # 0.1 dB se comparen exactamente con los presets.
+        n_bands = len(self.band_frequencies)
+        self._sliders = []     # [QSlider] por banda
+        self._gain_labels = [] # [QLabel] por banda
+        self._gains = np.zeros(n_bands, dtype=np.float64)
+        self._qs = np.full(n_bands, self.default_q, dtype=np.float64)
+        self._freqs = np.array(self.band_frequencies, dtype=np.float64)
+
+        # Presets compartidos a nivel de módulo (tuplas inmutables)
+        self.presets = _PRESETS
+        self._preset_names = _PRESET_NAMES
+        self._preset_matrix = _PRESET_MATRIX
+
+        # Diccionarios de parámetros listos para set_eq_params, construidos una sola vez
+        self._preset_params = {
+            name: {
+                i: {'gain': float(gain_db), 'q': self.default_q, 'freq': float(self.band_frequencies[i])}
+                for i, gain_db in enumerate(gains)
+            }
+            for name, gains in self.presets.items()
         }
 
         # Almacenar las configuraciones iniciales para poder restaurarlas al cancelar
         self._initial_eq_params = {} 
+        self._initial_params_array = None
+
+        # Mientras se arrastra un slider, las etiquetas de ganancia se actualizan como máximo
+        # cada 30 ms en lugar de en cada paso de 0.1 dB (cada setText provoca un repintado).
+        self._pending_labels = {} # {band_idx: valor del slider} pendientes de mostrar
+        self._label_timer = QTimer(self)
+        self._label_timer.setSingleShot(True)
+        self._label_timer.setInterval(30)
+        self._label_timer.timeout.connect(self._flush_pending_labels)
         
         self.init_ui()
-        self.load_settings(initial_settings)
-
-        # Copiar el estado actual de los parámetros (después de cargar initial_settings)
-        # Esto asegura que _initial_eq_params contenga los valores correctos al iniciar el diálogo.
-        self._initial_eq_params = self.get_current_eq_params()
+        self.set_initial_settings(initial_settings)
 
     def set_dark_theme(self):
         """Aplica un tema oscuro a la ventana y sus widgets."""
-        pal = QPalette()
-        pal.setColor(QPalette.ColorRole.Window, QColor(25, 25, 25))
-        pal.setColor(QPalette.ColorRole.WindowText, Qt.GlobalColor.white)
-        pal.setColor(QPalette.ColorRole.Base, QColor(35, 35, 35))
-        pal.setColor(QPalette.ColorRole.AlternateBase, QColor(45, 45, 45))
-        pal.setColor(QPalette.ColorRole.Text, Qt.GlobalColor.white)
-        pal.setColor(QPalette.ColorRole.Button, QColor(35, 35, 35))
-        pal.setColor(QPalette.ColorRole.ButtonText, Qt.GlobalColor.white)
-        pal.setColor(QPalette.ColorRole.Highlight, QColor(80, 160, 220))
-        pal.setColor(QPalette.ColorRole.HighlightedText, Qt.GlobalColor.black)
-        self.setPalette(pal)
+        self.setPalette(_get_dark_palette())
 
     def apply_styles(self):
         """Aplica estilos CSS para una apariencia moderna."""
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #1a1a1a;
-                border-radius: 10px;
-            }
-            QLabel {
-                color: #ddd;
-                font-size: 13px;
-            }
-            QSlider::groove:vertical {
-                width: 8px;
-                background: #555;
-                border-radius: 4px;
-            }
-            QSlider::handle:vertical {
-                width: 16px;
-                height: 16px;
-                background: #50b8f0;
-                border-radius: 8px;
-                margin: 0 -4px; /* Centrar el handle */
-            }
-            QSlider::add-page:vertical {
-                background: #888; /* Color de la parte "sin rellenar" del slider */
-            }
-            QSlider::sub-page:vertical {
-                background: #50b8f0; /* Color de la parte "rellenada" del slider */
-            }
-            QPushButton {
-                background: #333;
-                border: none;
-                border-radius: 8px;
-                padding: 8px 12px;
-                color: white;
-                font-size: 13px;
-                min-width: 60px;
-            }
-            QPushButton:hover {
-                background: #444;
-            }
-            QPushButton:pressed {
-                background: #222;
-            }
-            QComboBox {
-                background-color: #2b2b2b;
-                border: 1px solid #444;
-                border-radius: 5px;
-                padding: 5px;
-                color: #ddd;
-                font-size: 13px;
-                selection-background-color: #50b8f0; /* Color de fondo al seleccionar */
-                selection-color: black; /* Color del texto al seleccionar */
-            }
-            QComboBox::drop-down {
-                subcontrol-origin: padding;
-                subcontrol-position: top right;
-                width: 20px;
-                border-left-width: 1px;
-                border-left-color: #444;
-                border-left-style: solid; /* just a line */
-                border-top-right-radius: 3px; /* same radius as the QComboBox */
-                border-bottom-right-radius: 3px;
-            }
-            QComboBox::down-arrow {
-                image: url(data:image/svg+xml;base66,PHN2ZyB2aWV3Qm94PSIwIDAgMTAgNiIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48cGF0aCBkPSJNNi43MDcgNC4yOTNMMiA4LjgyOEwwIDYuMTIyTDUuNDQ0NDQgMS42NzdMMiA1LjQ0NDQ0TDYgOS40NDQ0NEwxMCA1LjQ0NDQ0TDUgMFoiLz48L3N2Zz4=); /* Pequeña flecha SVG hacia abajo */
-                width: 12px;
-                height: 12px;
-            }
-            QComboBox QAbstractItemView {
-                background-color: #2b2b2b;
-                border: 1px solid #444;
-                border-radius: 5px;
-                selection-background-color: #50b8f0;
-                selection-color: black;
-                color: #ddd;
-            }
-        """)
+        self.setStyleSheet(_EQ_STYLESHEET)
 
     def init_ui(self):
         """Configura la interfaz de usuario de la ventana del ecualizador."""
@@ -169,6 +384,11 @@ class EqualizerWindow(QDialog):
         preset_layout.addStretch(1) # Empuja el combo a la izquierda
         main_layout.addLayout(preset_layout)
 
+        # Fuentes compartidas por todas las bandas, construidas una sola vez
+        self._font_gain = QFont("Arial", 10) # Fuente para las etiquetas de ganancia
+        self._font_freq = QFont("Arial", 10, QFont.Weight.Bold) # Fuente en negrita para frecuencias
+
+        self._slider_index = {} # {QSlider: band_idx}
         bands_layout = QHBoxLayout()
         bands_layout.setSpacing(10)
         bands_layout.addStretch(1) # Espacio al principio
@@ -179,7 +399,7 @@ class EqualizerWindow(QDialog):
             # Etiqueta de ganancia
             gain_label = QLabel(f"{0.0:.1f} dB")
             gain_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            gain_label.setFont(QFont("Arial", 10)) # Fuente para las etiquetas de ganancia
+            gain_label.setFont(self._font_gain)
             band_widget.addWidget(gain_label)
 
             slider = QSlider(Qt.Orientation.Vertical)
@@ -188,26 +408,27 @@ class EqualizerWindow(QDialog):
             slider.setSingleStep(1) # Pasos de 0.1 dB en la UI
             slider.setTickInterval(5) # Cada 0.5 dB
             slider.setTickPosition(QSlider.TickPosition.TicksBelow)
-            # Conectar solo la actualización visual, NO la emisión de la señal principal aquí
-            slider.valueChanged.connect(lambda value, idx=i: self._update_slider_label(idx, value))
+            # Sin tracking, valueChanged solo se emite al soltar el slider (o con teclado/rueda);
+            # durante el arrastre sliderMoved actualiza únicamente la etiqueta.
+            # NO se emite la señal principal aquí.
+            # Todos los sliders comparten los mismos slots; la banda se obtiene del emisor.
+            slider.setTracking(False)
+            self._slider_index[slider] = i
+            slider.sliderMoved.connect(self._on_slider_moved)
+            slider.valueChanged.connect(self._on_slider_changed)
             
             # Etiqueta de frecuencia
             freq_label = QLabel(f"{freq} Hz")
             freq_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            freq_label.setFont(QFont("Arial", 10, QFont.Weight.Bold)) # Fuente en negrita para frecuencias
+            freq_label.setFont(self._font_freq)
             
             band_widget.addWidget(slider)
             band_widget.addWidget(freq_label)
             
             bands_layout.addLayout(band_widget)
             
-            self.eq_bands[i] = {
-                'slider': slider,
-                'gain_label': gain_label,
-                'gain': 0.0, # Este valor se actualizará en _update_slider_label
-                'q': self.default_q,
-                'freq': float(freq)
-            }
+            self._sliders.append(slider)
+            self._gain_labels.append(gain_label)
         bands_layout.addStretch(1) # Espacio al final
         main_layout.addLayout(bands_layout)
 
@@ -232,28 +453,83 @@ class EqualizerWindow(QDialog):
         button_layout.addStretch(1)
         main_layout.addLayout(button_layout)
 
+    def _on_slider_moved(self, value):
+        """Slot común durante el arrastre de un slider: identifica la banda por el emisor."""
+        self._update_slider_label(self._slider_index[self.sender()], value)
+
+    def _on_slider_changed(self, value):
+        """Slot común al confirmar el valor de un slider: identifica la banda por el emisor."""
+        self._commit_band_change(self._slider_index[self.sender()], value)
+
     def _update_slider_label(self, band_idx, value):
         """
-        Maneja el cambio de valor de un slider, actualizando solo la etiqueta
-        y el valor interno de la banda (NO emite la señal eq_params_changed).
+        Actualiza solo la etiqueta de una banda mientras se arrastra su slider.
+        Las actualizaciones se agrupan con _label_timer para no repintar en cada paso.
         """
-        gain_db = value / 10.0 # Convertir el valor del slider a dB
-        self.eq_bands[band_idx]['gain'] = gain_db # Actualizar el valor interno
-        self.eq_bands[band_idx]['gain_label'].setText(f"{gain_db:.1f} dB")
+        self._pending_labels[band_idx] = value
+        if not self._label_timer.isActive():
+            self._label_timer.start()
 
+    def _commit_band_change(self, band_idx, value):
+        """
+        Maneja el cambio de valor confirmado de un slider, actualizando la etiqueta,
+        el valor interno de la banda y el preset seleccionado
+        (NO emite la señal eq_params_changed).
+        """
+        self._gains[band_idx] = value / 10.0 # Convertir el valor del slider a dB
+        self._pending_labels.pop(band_idx, None)
+        self._gain_labels[band_idx].setText(self._db_label_cache[value])
+        # Mostrar el preset que coincide con la nueva configuración (o "Personalizado")
+        self._select_matching_preset(self._gains)
+
+    def _flush_pending_labels(self):
+        """Escribe en las etiquetas las ganancias acumuladas durante el arrastre."""
+        for band_idx, value in self._pending_labels.items():
+            self._gain_labels[band_idx].setText(self._db_label_cache[value])
+        self._pending_labels.clear()
 
     def get_current_eq_params(self):
         """
         Retorna un diccionario con los parámetros actuales del ecualizador.
+        Se mantiene por compatibilidad; el DSP debe usar get_current_eq_params_array().
         """
-        params = {}
-        for idx, band_data in self.eq_bands.items():
-            params[idx] = {
-                'gain': band_data['gain'],
-                'q': band_data['q'],
-                'freq': band_data['freq']
-            }
-        return params
+        return {
+            idx: {'gain': gain, 'q': q, 'freq': freq}
+            for idx, (gain, q, freq) in enumerate(zip(self._gains.tolist(), self._qs.tolist(), self._freqs.tolist()))
+        }
+
+    def get_current_eq_params_array(self):
+        """
+        Retorna los parámetros actuales como un array float32 contiguo de forma (n_bandas, 3)
+        con columnas gain (dB), q y freq (Hz). Es lo que emite eq_params_changed.
+        """
+        return np.stack([self._gains, self._qs, self._freqs], axis=1).astype(np.float32)
+
+    def get_eq_arrays(self):
+        """
+        Retorna copias de los arrays (ganancias en dB, factores Q, frecuencias en Hz)
+        de las bandas, listos para calcular los filtros sin recorrer diccionarios.
+        """
+        return self._gains.copy(), self._qs.copy(), self._freqs.copy()
+
+    def compute_biquads(self, fs):
+        """
+        Retorna los coeficientes (n_bandas, 6) de los filtros de todas las bandas para la
+        frecuencia de muestreo fs, calculados directamente sobre los arrays de las bandas.
+        """
+        return biquad_peaking_coeffs(self._freqs, self._qs, self._gains, float(fs))
+
+    def set_initial_settings(self, initial_settings_list):
+        """
+        Carga las ganancias con las que se abre el diálogo y las toma como estado a restaurar
+        al cancelar. Permite reutilizar la misma ventana entre aperturas.
+        """
+        self.load_settings(initial_settings_list)
+
+        # Copiar el estado actual de los parámetros (después de cargar initial_settings)
+        # Esto asegura que _initial_eq_params contenga los valores correctos al iniciar el diálogo.
+        self._initial_eq_params = self.get_current_eq_params()
+        self._initial_params_array = self.get_current_eq_params_array()
 
     def load_settings(self, initial_settings_list):
         """
@@ -279,17 +555,17 @@ class EqualizerWindow(QDialog):
         """
         Intenta seleccionar el preset en el QComboBox que coincide con la configuración actual de los sliders.
         """
-        for preset_name, preset_gains in self.presets.items():
-            # Comparar las ganancias actuales con las del preset
-            # Usar un pequeño epsilon para la comparación de flotantes si es necesario,
-            # pero aquí los sliders usan valores discretos, así que una comparación directa es OK.
-            if len(current_gains) == len(preset_gains) and all(g1 == g2 for g1, g2 in zip(current_gains, preset_gains)):
-                idx = self.preset_combo.findText(preset_name)
+        current = np.asarray(current_gains, dtype=np.float64)
+        if current.shape == (self._preset_matrix.shape[1],):
+            # Comparar las ganancias actuales con todos los presets a la vez.
+            # Los sliders usan valores discretos, así que una comparación directa es OK.
+            hits = np.flatnonzero((self._preset_matrix == current).all(axis=1))
+            if hits.size:
+                idx = self.preset_combo.findText(self._preset_names[hits[0]])
                 if idx != -1:
-                    # Desconectar temporalmente para evitar el bucle de señal
-                    self.preset_combo.currentIndexChanged.disconnect(self._on_preset_selected)
-                    self.preset_combo.setCurrentIndex(idx)
-                    self.preset_combo.currentIndexChanged.connect(self._on_preset_selected)
+                    # Bloquear temporalmente la señal para evitar el bucle
+                    with QSignalBlocker(self.preset_combo):
+                        self.preset_combo.setCurrentIndex(idx)
                     return
         
         # Si no se encuentra una coincidencia, seleccionar "Personalizado" o dejar en blanco
@@ -300,9 +576,8 @@ class EqualizerWindow(QDialog):
             custom_idx = self.preset_combo.findText("Personalizado") # Obtener el índice recién añadido
         
         # Seleccionar "Personalizado" si no se encontró un preset coincidente
-        self.preset_combo.currentIndexChanged.disconnect(self._on_preset_selected)
-        self.preset_combo.setCurrentIndex(custom_idx)
-        self.preset_combo.currentIndexChanged.connect(self._on_preset_selected)
+        with QSignalBlocker(self.preset_combo):
+            self.preset_combo.setCurrentIndex(custom_idx)
 
 
     def load_default_settings(self):
@@ -310,17 +585,13 @@ class EqualizerWindow(QDialog):
         Carga las configuraciones predeterminadas (Plano) para los sliders.
         Se llama al inicio o cuando se necesita resetear a un estado conocido.
         """
-        default_params = {}
-        for i, freq in enumerate(self.band_frequencies):
-            default_params[i] = {'gain': 0.0, 'q': self.default_q, 'freq': float(freq)}
-        self.set_eq_params(default_params)
+        self.set_eq_params(self._preset_params['Plano'])
         
         # Actualizar el QComboBox para que muestre "Plano"
         idx = self.preset_combo.findText('Plano')
         if idx != -1:
-            self.preset_combo.currentIndexChanged.disconnect(self._on_preset_selected)
-            self.preset_combo.setCurrentIndex(idx)
-            self.preset_combo.currentIndexChanged.connect(self._on_preset_selected)
+            with QSignalBlocker(self.preset_combo):
+                self.preset_combo.setCurrentIndex(idx)
 
 
     def set_eq_params(self, params_dict):
@@ -328,47 +599,44 @@ class EqualizerWindow(QDialog):
         Establece los parámetros del ecualizador desde un diccionario.
         Útil para cargar presets o el estado inicial.
         """
-        for idx, data in params_dict.items():
-            if idx in self.eq_bands:
-                slider = self.eq_bands[idx]['slider']
-                gain_db = data.get('gain', 0.0)
-                q_factor = data.get('q', self.default_q)
-                freq = data.get('freq', self.band_frequencies[idx])
-
-                slider_value = int(gain_db * 10)
-                
-                # Desconectar temporalmente para evitar que _update_slider_label se llame
-                try:
-                    slider.valueChanged.disconnect() 
-                except TypeError: # Si ya no está conectado, ignorar
-                    pass
-
-                slider.setValue(slider_value)
-                
-                # Reconectar el slot
-                slider.valueChanged.connect(lambda value, idx=idx: self._update_slider_label(idx, value))
+        # Desactivar el repintado mientras se actualizan todas las bandas para que los
+        # cambios de sliders y etiquetas se agrupen en un solo repintado al final.
+        self.setUpdatesEnabled(False)
+        try:
+            for idx, data in params_dict.items():
+                if 0 <= idx < len(self._sliders):
+                    slider = self._sliders[idx]
+                    gain_db = data.get('gain', 0.0)
+                    q_factor = data.get('q', self.default_q)
+                    freq = data.get('freq', self.band_frequencies[idx])
+
+                    slider_value = int(gain_db * 10)
                 
-                # Actualizar también los valores internos directamente
-                self.eq_bands[idx]['gain'] = gain_db
-                self.eq_bands[idx]['q'] = q_factor
-                self.eq_bands[idx]['freq'] = freq
-                self.eq_bands[idx]['gain_label'].setText(f"{gain_db:.1f} dB")
+                    # Bloquear temporalmente la señal para evitar que _update_slider_label se llame
+                    with QSignalBlocker(slider):
+                        slider.setValue(slider_value)
+
+                    # Actualizar también los valores internos directamente
+                    # (descartando cualquier etiqueta pendiente de un arrastre anterior)
+                    self._pending_labels.pop(idx, None)
+                    self._gains[idx] = gain_db
+                    self._qs[idx] = q_factor
+                    self._freqs[idx] = freq
+                    label_text = self._db_label_cache.get(slider_value)
+                    if label_text is None: # Ganancia fuera del rango de los sliders
+                        label_text = f"{gain_db:.1f} dB"
+                    self._gain_labels[idx].setText(label_text)
+        finally:
+            self.setUpdatesEnabled(True)
+            self.update()
     
     def _on_preset_selected(self, index):
         """
         Maneja la selección de un preset en el QComboBox.
         """
         preset_name = self.preset_combo.currentText()
-        if preset_name in self.presets:
-            preset_gains = self.presets[preset_name]
-            params_dict = {}
-            for i, gain_db in enumerate(preset_gains):
-                params_dict[i] = {
-                    'gain': float(gain_db),
-                    'q': self.default_q,
-                    'freq': float(self.band_frequencies[i])
-                }
-            self.set_eq_params(params_dict)
+        if preset_name in self._preset_params:
+            self.set_eq_params(self._preset_params[preset_name])
         elif preset_name == "Personalizado":
             # Si se selecciona "Personalizado", no se hace nada, los sliders mantienen su estado.
             pass
@@ -377,9 +645,16 @@ class EqualizerWindow(QDialog):
     def accept(self):
         """
         Sobrescribe el método accept para emitir la señal con los parámetros finales
-        antes de cerrar la ventana. Esto solo ocurre al presionar "Aplicar".
+        antes de cerrar la ventana. Esto solo ocurre al presionar "Aplicar" y solo si
+        los parámetros difieren de los que había al abrir el diálogo.
         """
-        self.eq_params_changed.emit(self.get_current_eq_params())
+        params = self.get_current_eq_params_array()
+        if np.array_equal(params, self._initial_params_array):
+            # Nada cambió desde que se abrió el diálogo: no reconfigurar los filtros
+            log.debug("Ecualizador sin cambios; no se emite eq_params_changed.")
+        else:
+            log.debug("Configuración del ecualizador aplicada: %s", params[:, 0])
+            self.eq_params_changed.emit(params)
         super().accept() # Llama al método accept() de la clase base
 
 
@@ -392,19 +667,20 @@ class EqualizerWindow(QDialog):
         self.set_eq_params(self._initial_eq_params)
         
         # Intentar seleccionar el preset que coincida con _initial_eq_params
-        initial_gains_list = [v['gain'] for k, v in self._initial_eq_params.items()]
-        self._select_matching_preset(initial_gains_list)
+        self._select_matching_preset(self._gains)
         
         super().reject() # Llama al método reject() de la clase base
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     app = QApplication(sys.argv)
     
     # Configurar hook de excepciones para depuración
     sys._excepthook = sys.excepthook
     def exception_hook(exctype, value, tb):
-        print("CRITICAL ERROR: Excepción no manejada en EqualizerWindow:")
+        import traceback # Solo se necesita al reportar una excepción
+        log.critical("Excepción no manejada en EqualizerWindow:")
         traceback.print_exception(exctype, value, tb)
         sys._excepthook(exctype, value, tb) # Llama al hook original
     sys.excepthook = exception_hook
@@ -415,14 +691,14 @@ if __name__ == '__main__':
     initial_eq_settings[2] = 5  # Ejemplo: aumenta 125 Hz en 5 dB
     initial_eq_settings[7] = -3 # Ejemplo: corta 4 kHz en 3 dB
     
-    print("--- Ecualizador de prueba ---")
+    log.info("--- Ecualizador de prueba ---")
     dialog = EqualizerWindow(initial_settings=initial_eq_settings)
     
     # Esta función se llamará SOLO si la ventana se cierra con 'Aplicar'
     def on_settings_applied(settings):
-        print("Configuraciones APLICADAS (se presionó 'Aplicar'):")
-        for idx, data in settings.items():
-            print(f"Banda {idx} (Freq: {data['freq']} Hz): Ganancia = {data['gain']:.1f} dB, Q = {data['q']:.1f}")
+        log.info("Configuraciones APLICADAS (se presionó 'Aplicar'):")
+        for idx, (gain, q, freq) in enumerate(settings):
+            log.info("Banda %d (Freq: %.0f Hz): Ganancia = %.1f dB, Q = %.1f", idx, freq, gain, q)
 
     dialog.eq_params_changed.connect(on_settings_applied) # Conectar la señal de aplicación
 
@@ -430,15 +706,15 @@ if __name__ == '__main__':
     result = dialog.exec() 
 
     if result == QDialog.DialogCode.Accepted:
-        print("\nVentana de ecualizador cerrada con 'Aplicar'. Los cambios se han emitido.")
+        log.info("Ventana de ecualizador cerrada con 'Aplicar'. Los cambios se han emitido.")
         # La función on_settings_applied ya se encargó de imprimir los ajustes.
     else: # QDialog.DialogCode.Rejected
-        print("\nVentana de ecualizador cerrada con 'Cancelar' o 'X'. ¡Se descartaron los cambios!")
+        log.info("Ventana de ecualizador cerrada con 'Cancelar' o 'X'. ¡Se descartaron los cambios!")
         # Para mostrar los parámetros reales que _initial_eq_params tenía (restaurados)
-        print("Los ajustes restaurados visualmente en el diálogo son:")
+        log.info("Los ajustes restaurados visualmente en el diálogo son:")
         restored_params = dialog.get_current_eq_params()
         for idx, data in restored_params.items():
-            print(f"Banda {idx} (Freq: {data['freq']} Hz): Ganancia = {data['gain']:.1f} dB")
+            log.info("Banda %d (Freq: %.0f Hz): Ganancia = %.1f dB", idx, data['freq'], data['gain'])
 
 
     sys.exit(app.exec())
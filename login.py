@@ -1,7 +1,9 @@
 import sys
+import hashlib
+import hmac
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit,
-    QPushButton, QMessageBox, QVBoxLayout
+    QPushButton, QVBoxLayout
 )
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt
@@ -12,11 +14,54 @@ usuarios = {
     "juan": "clave456"
 }
 
+def _hash_contrasena(contrasena):
+    return hashlib.sha256(contrasena.encode("utf-8")).digest()
+
+# Usuarios normalizados con casefold (sin distinguir mayúsculas) junto a su nombre original
+# y el hash de su contraseña, calculados una sola vez al cargar el módulo
+_usuarios_normalizados = {
+    usuario.casefold(): (usuario, _hash_contrasena(clave)) for usuario, clave in usuarios.items()
+}
+# Entrada de relleno para que un usuario inexistente tarde lo mismo en verificarse
+_entrada_relleno = (None, _hash_contrasena(""))
+
+# Hojas de estilo de la ventana, definidas una sola vez y aplicadas en un único setStyleSheet
+# (las reglas de QLineEdit y QPushButton van después para prevalecer sobre la de QWidget)
+_ESTILO_VENTANA = """
+    QWidget {
+        background-color: #2c3e50;
+    }
+    QLabel#titulo {
+        color: white;
+    }
+"""
+
+_ESTILO_INPUT = """
+    QLineEdit {
+        background-color: #ecf0f1;
+        border: none;
+        border-radius: 8px;
+        padding: 12px;
+    }
+"""
+
+_ESTILO_BOTON = """
+    QPushButton {
+        background-color: #3498db;
+        color: white;
+        padding: 12px;
+        border-radius: 10px;
+    }
+    QPushButton:hover {
+        background-color: #2980b9;
+    }
+"""
+
 class LoginWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Inicio de Sesión")
-        self.setStyleSheet("background-color: #2c3e50;")
+        self.setStyleSheet(_ESTILO_VENTANA + _ESTILO_INPUT + _ESTILO_BOTON)
         self.init_ui()
 
     def init_ui(self):
@@ -30,35 +75,22 @@ class LoginWindow(QWidget):
         # Título
         title = QLabel("🔐Inicio de Sesión")
         title.setFont(QFont("Arial", 20, QFont.Bold))
-        title.setStyleSheet("color: white;")
+        title.setObjectName("titulo")
         title.setAlignment(Qt.AlignCenter)
 
         self.input_usuario = QLineEdit()
         self.input_usuario.setPlaceholderText("Nombre de usuario")
         self.input_usuario.setFont(font_input)
-        self.input_usuario.setStyleSheet(self.estilo_input())
 
         self.input_contrasena = QLineEdit()
         self.input_contrasena.setPlaceholderText("Contraseña")
         self.input_contrasena.setFont(font_input)
         self.input_contrasena.setEchoMode(QLineEdit.Password)
-        self.input_contrasena.setStyleSheet(self.estilo_input())
 
         boton_login = QPushButton("Iniciar sesión")
         boton_login.setFont(QFont("Arial", 12, QFont.Bold))
         boton_login.setCursor(Qt.PointingHandCursor)
         boton_login.clicked.connect(self.verificar_login)
-        boton_login.setStyleSheet("""
-            QPushButton {
-                background-color: #3498db;
-                color: white;
-                padding: 12px;
-                border-radius: 10px;
-            }
-            QPushButton:hover {
-                background-color: #2980b9;
-            }
-        """)
 
         layout.addWidget(title)
         layout.addWidget(self.input_usuario)
@@ -67,22 +99,19 @@ class LoginWindow(QWidget):
 
         self.setLayout(layout)
 
-    def estilo_input(self):
-        return """
-            QLineEdit {
-                background-color: #ecf0f1;
-                border: none;
-                border-radius: 8px;
-                padding: 12px;
-            }
-        """
-
     def verificar_login(self):
+        # QMessageBox solo se necesita al pulsar el botón, no para mostrar la ventana
+        from PyQt5.QtWidgets import QMessageBox
+
         usuario = self.input_usuario.text()
         contrasena = self.input_contrasena.text()
 
-        if usuario in usuarios and usuarios[usuario] == contrasena:
-            QMessageBox.information(self, "Éxito", f"¡Bienvenido, {usuario}!")
+        # Comparación en tiempo constante de los hashes (no revela dónde difieren)
+        nombre, hash_guardado = _usuarios_normalizados.get(usuario.casefold(), _entrada_relleno)
+        coincide = hmac.compare_digest(hash_guardado, _hash_contrasena(contrasena))
+
+        if nombre is not None and coincide:
+            QMessageBox.information(self, "Éxito", f"¡Bienvenido, {nombre}!")
         else:
             QMessageBox.critical(self, "Error", "Usuario o contraseña incorrectos.")
 
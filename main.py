@@ -2,27 +2,35 @@ import sys
 import os
 import random
 import threading
-import queue
 import time
+import hashlib
+import functools
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import traceback
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QSlider, QListWidget, QLabel, QFileDialog, QStyle,
+    QPushButton, QSlider, QListWidget, QLabel, QStyle,
     QSizePolicy, QSpacerItem, QLineEdit, QMenu, QMessageBox,
     QToolButton, QWidgetAction, QDialog
 )
-from PyQt6.QtGui import QPalette, QColor, QPixmap, QImage, QIcon, QPainter, QBrush, QPen
-from PyQt6.QtCore import Qt, QUrl, QVariant, QTimer, QEvent, QSettings, pyqtSignal, QSize, QThread
+from PyQt6.QtGui import QPalette, QColor, QPixmap, QPixmapCache, QImage, QImageReader, QIcon, QPainter, QBrush, QPen
+from PyQt6.QtCore import (
+    Qt, QVariant, QTimer, QEvent, QSettings, pyqtSignal, QSize, QThread,
+    QObject, QRunnable, QThreadPool, QBuffer, QByteArray, QIODevice, QStandardPaths
+)
 
-from ecualizador import EqualizerWindow
+from ecualizador import (EqualizerWindow, BAND_FREQUENCIES, peaking_band_trig, peaking_coeffs_from_trig,
+                         sos_cascade, sanitize_finite, resample_block, scale_inplace, NUMBA_AVAILABLE)
+from biblioteca import BibliotecaEtiquetas, firma, firma_estado
 
 try:
     import soundfile as sf
     import sounddevice as sd
-    from scipy.signal import iirfilter, lfilter, freqz, resample # Importar resample
-    from scipy.fft import fft
+    from scipy.signal import sosfilt, freqz, resample # Importar resample
+    from scipy.fft import rfft
     print("Librerías DSP (SoundFile, SoundDevice, SciPy, NumPy) cargadas exitosamente.")
 except ImportError as e:
     print(f"Advertencia: No se pudieron cargar todas las librerías DSP. El ecualizador y el visualizador no tendrán efecto audible. Error: {e}")
@@ -45,20 +53,183 @@ except ImportError as e:
         sd = DummySoundDevice()
         sd.OutputStream = DummySoundDevice
 
-    if 'iirfilter' not in locals() or iirfilter is None:
-        def iirfilter(*args, **kwargs): return [1.0], [1.0]
-    if 'lfilter' not in locals() or lfilter is None:
-        def lfilter(b, a, x, zi=None):
+    if 'sosfilt' not in locals() or sosfilt is None:
+        def sosfilt(sos, x, axis=-1, zi=None):
             if zi is not None: return x, zi
             return x
-    if 'fft' not in locals() or fft is None:
-        def fft(data): return np.zeros_like(data)
+    if 'rfft' not in locals() or rfft is None:
+        rfft = np.fft.rfft
     if 'resample' not in locals() or resample is None:
         def resample(x, num, t=None, axis=0, window=None):
             if x.ndim > 1:
                 return np.zeros((num, x.shape[1]), dtype=x.dtype)
             return np.zeros(num, dtype=x.dtype)
 
+# Extensiones de audio soportadas (en minúsculas, con el punto)
+_AUDIO_EXTS = frozenset(('.mp3', '.wav', '.ogg', '.oga', '.flac'))
+
+# Hilos para comprobar a la vez si existen las rutas de una playlist M3U; cada stat espera
+# al disco o a la red sin retener el GIL
+_M3U_STAT_WORKERS = 16
+
+# Hojas de estilo, definidas una sola vez a nivel de módulo
+_MAIN_STYLESHEET = """
+    QMainWindow {
+        background-color: #1a1a1a;
+    }
+    QListWidget {
+        background-color: #2b2b2b;
+        border: 1px solid #444;
+        border-radius: 10px;
+        color: #ddd;
+        padding: 5px;
+    }
+    QListWidget::item {
+        padding: 8px;
+        margin-bottom: 2px;
+        border-radius: 5px;
+    }
+    QListWidget::item:selected {
+        background-color: #50b8f0;
+        color: black;
+    }
+    QLabel {
+        color: #ddd;
+    }
+    QLabel#albumArt {
+        background-color: #3a3a3a;
+        border: 1px solid #555;
+        border-radius: 10px;
+        qproperty-alignment: AlignCenter;
+        color: #bbb;
+        font-size: 16px;
+    }
+    QSlider::groove:horizontal {
+        height: 8px;
+        background: #555;
+        border-radius: 4px;
+    }
+    QSlider::handle:horizontal {
+        width: 16px;
+        height: 16px;
+        background: #50b8f0;
+        border-radius: 8px;
+        margin: -4px 0;
+    }
+    QSlider::add-page:horizontal {
+        background: #888;
+    }
+    QSlider::sub-page:horizontal {
+        background: #50b8f0;
+    }
+    QSlider::groove:vertical {
+        width: 8px;
+        background: #555;
+        border-radius: 4px;
+    }
+    QSlider::handle:vertical {
+        width: 16px;
+        height: 16px;
+        background: #50b8f0;
+        border-radius: 8px;
+        margin: 0 -4px;
+    }
+    QSlider::add-page:vertical {
+        background: #888;
+    }
+    QSlider::sub-page:vertical {
+        background: #50b8f0;
+    }
+    QPushButton {
+        background: #333;
+        border: none;
+        border-radius: 8px;
+        padding: 10px 15px;
+        color: white;
+        font-size: 14px;
+    }
+    QPushButton:hover {
+        background: #444;
+    }
+    QPushButton:pressed {
+        background: #222;
+    }
+    QPushButton[checkable="true"][checked="true"] {
+        background: #50b8f0;
+    }
+    QLineEdit {
+        background-color: #2b2b2b;
+        border: 1px solid #444;
+        border-radius: 8px;
+        color: #ddd;
+        padding: 8px;
+        font-size: 14px;
+    }
+    QLineEdit:focus {
+        border: 1px solid #50b8f0;
+    }
+    QToolButton {
+        background: #333;
+        border: none;
+        border-radius: 8px;
+        padding: 10px 15px;
+        color: white;
+        font-size: 14px;
+    }
+    QToolButton:hover {
+        background: #444;
+    }
+    QToolButton:pressed {
+        background: #222;
+    }
+    QToolButton::menu-indicator {
+        image: none;
+    }
+    QMenu {
+        background-color: #2b2b2b;
+        border: 1px solid #444;
+        border-radius: 5px;
+        color: #ddd;
+    }
+    QMenu::item {
+        padding: 8px 20px 8px 15px;
+        background-color: transparent;
+    }
+    QMenu::item:selected {
+        background-color: #50b8f0;
+        color: black;
+    }
+"""
+
+_MESSAGE_BOX_STYLESHEET = """
+    QMessageBox {
+        background-color: #2b2b2b;
+        color: #ddd;
+        font-size: 14px;
+    }
+    QMessageBox QLabel {
+        color: #ddd;
+    }
+    QMessageBox QPushButton {
+        background: #333;
+        border: none;
+        border-radius: 5px;
+        padding: 5px 10px;
+        color: white;
+    }
+    QMessageBox QPushButton:hover {
+        background: #444;
+    }
+"""
+
+# Botón "Mostrar Detalles" del diálogo de error crítico
+_DETAILS_BUTTON_STYLESHEET = """
+    QMessageBox QPushButton#qt_msgbox_button_ShowDetails {
+        background: #50b8f0;
+        color: black;
+    }
+"""
+
 
 # Importaciones para COM (solo en Windows)
 if sys.platform == "win32":
@@ -186,8 +357,7 @@ else:
     print("DEBUG: No se requiere COM para la detección de dispositivos de audio en este sistema operativo.")
 
 
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3NoHeaderError, ID3, APIC
+from mutagen.id3 import ID3NoHeaderError, ID3, APIC, Frames, Frames_2_2
 from mutagen.flac import FLAC
 from mutagen.oggvorbis import OggVorbis
 
@@ -206,30 +376,7 @@ def custom_exception_hook(exctype, value, tb):
     msg_box.setText("¡La aplicación ha encontrado un error inesperado!")
     msg_box.setInformativeText("Haz clic en 'Mostrar Detalles' para ver más información.")
     msg_box.setDetailedText(error_message)
-    msg_box.setStyleSheet("""
-        QMessageBox {
-            background-color: #2b2b2b;
-            color: #ddd;
-            font-size: 14px;
-        }
-        QMessageBox QLabel {
-            color: #ddd;
-        }
-        QMessageBox QPushButton {
-            background: #333;
-            border: none;
-            border-radius: 5px;
-            padding: 5px 10px;
-            color: white;
-        }
-        QMessageBox QPushButton:hover {
-            background: #444;
-        }
-        QMessageBox QPushButton#qt_msgbox_button_ShowDetails {
-            background: #50b8f0;
-            color: black;
-        }
-    """)
+    msg_box.setStyleSheet(_MESSAGE_BOX_STYLESHEET + _DETAILS_BUTTON_STYLESHEET)
     msg_box.exec()
     sys.exit(1)
 
@@ -237,15 +384,457 @@ def custom_exception_hook(exctype, value, tb):
 sys.excepthook = custom_exception_hook
 
 
+def _iter_audio_files(folder_path):
+    """Recorre folder_path recursivamente y genera los DirEntry de los archivos de audio."""
+    # os.scandir devuelve el tipo de cada entrada sin un stat extra y la ruta completa
+    # ya construida; las extensiones se comprueban contra un frozenset.
+    pending_dirs = [folder_path]
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        subdirs = []
+        try:
+            with os.scandir(current_dir) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in _AUDIO_EXTS:
+                        yield entry
+        except OSError as e:
+            print(f"Advertencia: No se pudo leer la carpeta {current_dir}: {e}")
+            continue
+        # Recorrer las subcarpetas en el mismo orden que os.walk (la pila las saca al revés)
+        pending_dirs.extend(reversed(subdirs))
+
+
+class ScanWorkerSignals(QObject):
+    batch_ready = pyqtSignal(dict) # Lote {ruta: firma (mtime, tamaño) o None} de los archivos encontrados
+    finished = pyqtSignal()
+
+
+class ScanWorker(QRunnable):
+    """Escanea una carpeta en el QThreadPool y entrega las rutas por lotes al hilo de la UI."""
+    BATCH_SIZE = 256
+
+    def __init__(self, folder_path, known_files=frozenset()):
+        super().__init__()
+        self.folder_path = folder_path
+        # Copia de las rutas ya en la playlist al empezar: al reescanear una carpeta no se
+        # envían a la UI miles de rutas que add_files_to_playlist solo descartaría
+        self.known_files = known_files
+        self.cancelled = False # Lo pone cancel() desde el hilo de la UI
+        self.signals = ScanWorkerSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        batch = {}
+        seen = set(self.known_files)
+        try:
+            for entry in _iter_audio_files(self.folder_path):
+                if self.cancelled:
+                    print(f"DEBUG: ScanWorker: Escaneo de {self.folder_path} cancelado.")
+                    return
+                path = entry.path
+                if path in seen:
+                    continue
+                seen.add(path)
+                # La firma sale del stat de os.scandir (sin coste extra en Windows) y la usan
+                # TagPrefetchWorker y DurationWorker en lugar de volver a consultar el archivo
+                try:
+                    batch[path] = firma_estado(entry.stat())
+                except OSError:
+                    batch[path] = None
+                if len(batch) >= self.BATCH_SIZE:
+                    self.signals.batch_ready.emit(batch)
+                    batch = {}
+            if batch:
+                self.signals.batch_ready.emit(batch)
+        except Exception as e:
+            print(f"Error al escanear la carpeta {self.folder_path}: {e}")
+        finally:
+            self.signals.finished.emit()
+
+
+# Únicos frames ID3 que se usan (título, artista, álbum, pista y carátula), con sus equivalentes
+# de ID3v2.2. El resto (letras, comentarios, etc.) mutagen los guarda sin interpretarlos.
+_ID3_TAG_FRAMES = {name: Frames[name] for name in ('TIT2', 'TPE1', 'TALB', 'TRCK')}
+_ID3_TAG_FRAMES.update({name: Frames_2_2[name] for name in ('TT2', 'TP1', 'TAL', 'TRK')})
+_ID3_ART_FRAMES = dict(_ID3_TAG_FRAMES, APIC=Frames['APIC'], PIC=Frames_2_2['PIC'])
+
+
+def _read_id3_tags(file_path, read_art):
+    # Solo la etiqueta ID3, sin analizar el flujo MPEG, y solo con los frames necesarios
+    try:
+        return ID3(file_path, known_frames=_ID3_ART_FRAMES if read_art else _ID3_TAG_FRAMES)
+    except ID3NoHeaderError:
+        return None # MP3 sin etiqueta ID3, igual que MP3(file_path).tags
+
+
+def _read_flac_tags(file_path, read_art):
+    return FLAC(file_path).tags
+
+
+def _read_ogg_tags(file_path, read_art):
+    return OggVorbis(file_path).tags
+
+
+# Campos que se muestran: clave de Vorbis (FLAC/OGG) y frame ID3 equivalente, en el orden
+# título, artista, álbum y pista
+_TAG_FIELDS = (('title', 'TIT2'), ('artist', 'TPE1'), ('album', 'TALB'), ('tracknumber', 'TRCK'))
+
+
+# Lector de etiquetas según la extensión (en minúsculas); los WAV no tienen etiquetas que leer
+_TAG_READERS = {
+    '.mp3': _read_id3_tags,
+    '.flac': _read_flac_tags,
+    '.ogg': _read_ogg_tags,
+    '.oga': _read_ogg_tags,
+}
+
+
+def _read_track_metadata(file_path, read_art=True):
+    """
+    Lee las etiquetas de un archivo con mutagen. Retorna un dict con path, title, artist,
+    album, tracknum y art_data (bytes de la carátula o None). Es seguro llamarla desde hilos.
+    """
+    title = os.path.splitext(os.path.basename(file_path))[0]
+    artist = '-'
+    album = '-'
+    tracknum = '-'
+    album_art_data = None
+
+    current_tracknum_raw = tracknum
+
+    try:
+        tags = None
+        tag_reader = _TAG_READERS.get(os.path.splitext(file_path)[1].lower())
+        if tag_reader is not None:
+            tags = tag_reader(file_path, read_art)
+
+        if tags:
+            # El tipo de etiqueta decide una sola clave por campo: un get por campo en lugar
+            # de probar la clave de Vorbis y después comprobar y leer el frame ID3
+            is_id3 = isinstance(tags, ID3)
+            values = []
+            for vorbis_key, id3_key in _TAG_FIELDS:
+                if is_id3:
+                    frame = tags.get(id3_key)
+                    values.append(str(frame) if frame is not None else None)
+                else:
+                    field = tags.get(vorbis_key)
+                    values.append(str(field[0]) if field else None)
+            title_value, artist_value, album_value, tracknum_value = values
+            if title_value is not None:
+                title = title_value
+            if artist_value is not None:
+                artist = artist_value
+            if album_value is not None:
+                album = album_value
+            if tracknum_value is not None:
+                current_tracknum_raw = tracknum_value
+
+            if read_art:
+                if is_id3:
+                    album_art_data = next((v.data for k, v in tags.items()
+                                           if k.startswith('APIC') and isinstance(v, APIC)), None)
+                elif hasattr(tags, 'pictures') and tags.pictures:
+                    album_art_data = next((pic.data for pic in tags.pictures if pic.type == 3), None)
+
+    except ID3NoHeaderError:
+        print(f"Advertencia: No se encontraron etiquetas ID3 en {file_path}.")
+    except Exception as e:
+        print(f"Error general al leer metadatos de {file_path}: {e}")
+
+    if isinstance(current_tracknum_raw, str) and '/' in current_tracknum_raw:
+        tracknum = current_tracknum_raw.split('/')[0]
+    else:
+        tracknum = str(current_tracknum_raw)
+
+    return {'path': file_path, 'title': title, 'artist': artist, 'album': album,
+            'tracknum': tracknum, 'art_data': album_art_data}
+
+
+def _search_tags(meta):
+    """Convierte un resultado de _read_track_metadata en (título, artista, álbum) para buscar."""
+    return (
+        meta['title'].lower(),
+        '' if meta['artist'] == '-' else meta['artist'].lower(),
+        '' if meta['album'] == '-' else meta['album'].lower(),
+    )
+
+
+# Carpeta de caché del usuario según la plataforma (~/.cache en Linux, ~/Library/Caches en
+# macOS, %LOCALAPPDATA%\cache en Windows). Se usa la ubicación genérica porque no depende del
+# nombre de la aplicación, que aún no existe al importar el módulo.
+_CACHE_DIR = os.path.join(
+    QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation)
+    or os.path.join(os.path.expanduser("~"), ".cache"),
+    "MusicPlayer")
+# Carpeta donde se guardan las carátulas ya escaladas al tamaño de la etiqueta
+_ART_CACHE_DIR = os.path.join(_CACHE_DIR, "covers")
+# Índice SQLite con las etiquetas de búsqueda (ver biblioteca.py)
+_LIBRARY_DB_PATH = os.path.join(_CACHE_DIR, "library.db")
+
+
+def _art_cache_key(file_path, target_size):
+    """
+    Clave de QPixmapCache para la carátula de file_path escalada a target_size. Con el mtime
+    y el tamaño en la clave, una canción modificada o una etiqueta de otro tamaño no reutilizan
+    un pixmap que ya no corresponde.
+    """
+    try:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        mtime = 0
+    return f"{file_path}:{mtime}:{target_size.width()}x{target_size.height()}"
+
+
+def _cached_art_path(file_path, target_size):
+    """
+    Ruta del PNG escalado de la carátula de file_path en la caché de disco. El nombre es el
+    hash de la misma clave que en QPixmapCache, así que si la canción se modifica o cambia el
+    tamaño de la etiqueta la entrada vieja deja de usarse.
+    """
+    digest = hashlib.blake2b(_art_cache_key(file_path, target_size).encode('utf-8'),
+                             digest_size=20).hexdigest()
+    return os.path.join(_ART_CACHE_DIR, f"{digest}.png")
+
+
+def _display_format(image):
+    """
+    Convierte image al formato de 32 bits con el que pinta el backend raster de Qt, para que
+    QPixmap.fromImage en el hilo de la UI no tenga que convertir cada píxel.
+    """
+    if image.hasAlphaChannel():
+        return image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+    return image.convertToFormat(QImage.Format.Format_RGB32)
+
+
+def _decode_scaled_art(art_data, target_size):
+    """
+    Decodifica la carátula directamente al tamaño de la etiqueta (manteniendo la proporción).
+    QImageReader escala durante la decodificación (en JPEG, con el escalado DCT de libjpeg),
+    así una portada de 4000x4000 no se descomprime entera para luego descartarla.
+    Devuelve un QImage, que a diferencia de QPixmap puede usarse fuera del hilo principal,
+    o None si los datos no son una imagen válida.
+    """
+    buffer = QBuffer()
+    buffer.setData(QByteArray(art_data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    reader = QImageReader(buffer)
+    reader.setAutoTransform(True)
+    original_size = reader.size()
+    if original_size.isValid():
+        reader.setScaledSize(original_size.scaled(target_size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if not image.isNull():
+        return _display_format(image)
+
+    # Formatos cuyo lector no informa el tamaño o no admite escalado: decodificar y escalar después
+    # en dos pasos. El rápido (sin filtrado) baja a 2x el tamaño final y el suavizado, cuyo coste
+    # crece con los píxeles de origen, solo trabaja sobre esa imagen ya pequeña.
+    image = QImage()
+    if image.loadFromData(art_data):
+        double_size = target_size * 2
+        if image.width() > double_size.width() or image.height() > double_size.height():
+            image = image.scaled(double_size, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.FastTransformation)
+        return _display_format(image.scaled(target_size, Qt.AspectRatioMode.KeepAspectRatio,
+                                            Qt.TransformationMode.SmoothTransformation))
+    return None
+
+
+class MetadataWorkerSignals(QObject):
+    ready = pyqtSignal(dict) # Resultado de _read_track_metadata más 'image' (QImage o None) y 'request_id'
+
+
+class MetadataWorker(QRunnable):
+    """Lee las etiquetas de una canción y decodifica/escala su carátula fuera del hilo de la UI."""
+
+    def __init__(self, file_path, art_size, read_art=True, request_id=0):
+        super().__init__()
+        self.file_path = file_path
+        self.art_size = art_size
+        self.read_art = read_art # False si la carátula ya está en QPixmapCache
+        self.request_id = request_id # Se devuelve en el resultado para descartar lecturas viejas
+        self.signals = MetadataWorkerSignals()
+
+    def run(self):
+        if not self.read_art:
+            meta = _read_track_metadata(self.file_path, read_art=False)
+            meta['image'] = None
+            meta['request_id'] = self.request_id
+            self.signals.ready.emit(meta)
+            return
+
+        cache_path = _cached_art_path(self.file_path, self.art_size)
+
+        image = None
+        if os.path.exists(cache_path):
+            # Carátula ya escalada en la caché: no hace falta extraerla ni decodificarla
+            meta = _read_track_metadata(self.file_path, read_art=False)
+            image = QImage(cache_path)
+            image = None if image.isNull() else _display_format(image)
+        else:
+            meta = _read_track_metadata(self.file_path)
+            if meta['art_data']:
+                image = _decode_scaled_art(meta['art_data'], self.art_size)
+                if image is not None:
+                    try:
+                        os.makedirs(_ART_CACHE_DIR, exist_ok=True)
+                        image.save(cache_path, 'PNG')
+                    except OSError as e:
+                        print(f"Advertencia: No se pudo guardar la carátula en caché: {e}")
+                else:
+                    print("No se pudo cargar la imagen de la carátula desde los datos.")
+                    image = None
+        meta['art_data'] = None # Los bytes originales ya no se necesitan en el hilo de la UI
+        meta['image'] = image
+        meta['request_id'] = self.request_id
+        self.signals.ready.emit(meta)
+
+
+class TagPrefetchSignals(QObject):
+    batch_ready = pyqtSignal(dict) # {ruta: (título, artista, álbum)}
+
+
+class TagPrefetchWorker(QRunnable):
+    """
+    Obtiene en segundo plano las etiquetas de búsqueda de los archivos recién añadidos: del
+    índice de la biblioteca si el archivo no ha cambiado y, si no, leyéndolas con mutagen.
+    """
+    BATCH_SIZE = 64
+
+    def __init__(self, file_paths, db_path=None, signatures=None):
+        super().__init__()
+        self.file_paths = list(file_paths)
+        self.db_path = db_path # None si el índice de la biblioteca no está disponible
+        self.signatures = signatures or {} # {ruta: firma} ya tomadas por ScanWorker
+        self.signals = TagPrefetchSignals()
+
+    def run(self):
+        biblioteca = None
+        if self.db_path is not None:
+            try:
+                # Conexión propia: las de sqlite3 no se pueden usar desde otro hilo
+                biblioteca = BibliotecaEtiquetas(self.db_path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Advertencia: No se pudo abrir el índice de la biblioteca: {e}")
+        try:
+            for start in range(0, len(self.file_paths), self.BATCH_SIZE):
+                file_paths = self.file_paths[start:start + self.BATCH_SIZE]
+                # Firma tomada antes de leer: si el archivo cambia durante la lectura, la
+                # guardada ya no coincidirá y la próxima vez se vuelve a leer
+                signatures = {f: self.signatures.get(f) or firma(f) for f in file_paths}
+                batch = {}
+                if biblioteca is not None:
+                    try:
+                        batch = biblioteca.cargar(signatures)
+                    except sqlite3.Error as e:
+                        print(f"Advertencia: No se pudo leer el índice de la biblioteca: {e}")
+                read_now = {f: _search_tags(_read_track_metadata(f, read_art=False))
+                            for f in file_paths if f not in batch}
+                if read_now and biblioteca is not None:
+                    try:
+                        biblioteca.guardar(read_now, signatures)
+                    except sqlite3.Error as e:
+                        print(f"Advertencia: No se pudo actualizar el índice de la biblioteca: {e}")
+                batch.update(read_now)
+                self.signals.batch_ready.emit(batch)
+        finally:
+            if biblioteca is not None:
+                biblioteca.cerrar()
+
+
+class DurationWorkerSignals(QObject):
+    batch_ready = pyqtSignal(dict) # {ruta: duración en ms, o None si soundfile no pudo leerla}
+
+
+class DurationWorker(QRunnable):
+    """
+    Obtiene fuera del hilo de la UI la duración de los archivos recién añadidos: del índice de
+    la biblioteca si el archivo conserva su firma y, si no, abriendo su cabecera con soundfile.
+    """
+    BATCH_SIZE = 64
+
+    def __init__(self, file_paths, db_path=None, signatures=None):
+        super().__init__()
+        self.file_paths = list(file_paths)
+        self.db_path = db_path # None si el índice de la biblioteca no está disponible
+        self.signatures = signatures or {} # {ruta: firma} ya tomadas por ScanWorker
+        self.signals = DurationWorkerSignals()
+
+    def run(self):
+        biblioteca = None
+        if self.db_path is not None:
+            try:
+                # Conexión propia: las de sqlite3 no se pueden usar desde otro hilo
+                biblioteca = BibliotecaEtiquetas(self.db_path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Advertencia: No se pudo abrir el índice de la biblioteca: {e}")
+        try:
+            for start in range(0, len(self.file_paths), self.BATCH_SIZE):
+                file_paths = self.file_paths[start:start + self.BATCH_SIZE]
+                # Firma (mtime en ns, tamaño) tomada antes de leer, la misma con la que se
+                # comprueba la duración guardada y con la que se guarda la recién leída
+                signatures = {f: self.signatures.get(f) or firma(f) for f in file_paths}
+                batch = {}
+                if biblioteca is not None:
+                    try:
+                        batch = biblioteca.cargar_duraciones(signatures)
+                    except sqlite3.Error as e:
+                        print(f"Advertencia: No se pudo leer el índice de la biblioteca: {e}")
+                read_now = {}
+                if sf:
+                    for file_path in file_paths:
+                        if file_path in batch:
+                            continue
+                        try:
+                            read_now[file_path] = int(sf.info(file_path).duration) * 1000
+                        except Exception as e:
+                            print(f"Error al obtener la duración de {file_path} con soundfile: {e}")
+                            read_now[file_path] = None
+                # Las que soundfile no pudo leer no se guardan, para reintentarlas la próxima vez
+                readable = {f: d for f, d in read_now.items() if d is not None}
+                if readable and biblioteca is not None:
+                    try:
+                        biblioteca.guardar_duraciones(readable, signatures)
+                    except sqlite3.Error as e:
+                        print(f"Advertencia: No se pudo actualizar el índice de la biblioteca: {e}")
+                batch.update(read_now)
+                if batch:
+                    self.signals.batch_ready.emit(batch)
+        finally:
+            if biblioteca is not None:
+                biblioteca.cerrar()
+
+
 class ClickableSlider(QSlider):
     clicked_value_set = pyqtSignal(int)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._update_orientation_cache()
+
+    def setOrientation(self, orientation):
+        super().setOrientation(orientation)
+        self._update_orientation_cache()
+
+    def _update_orientation_cache(self):
+        # La orientación solo cambia aquí; el clic usa el resultado sin consultarla ni ramificar.
+        # En vertical el mínimo está abajo, así que la posición se mide desde el borde inferior.
+        if self.orientation() == Qt.Orientation.Horizontal:
+            self._click_span = self.width
+            self._click_pos = lambda pos: pos.x()
+        else:
+            self._click_span = self.height
+            self._click_pos = lambda pos: self.height() - pos.y()
+
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
-            if self.orientation() == Qt.Orientation.Horizontal:
-                value = self.minimum() + ((self.maximum() - self.minimum()) * event.pos().x()) / self.width()
-            else:
-                value = self.minimum() + ((self.maximum() - self.minimum()) * (self.height() - event.pos().y())) / self.height()
+            minimum = self.minimum()
+            value = minimum + ((self.maximum() - minimum) * self._click_pos(event.pos())) / self._click_span()
 
             self.setValue(int(value))
             self.clicked_value_set.emit(int(value))
@@ -256,6 +845,205 @@ class ClickableSlider(QSlider):
         super().mouseMoveEvent(event)
 
 
+# Centros y Q de las bandas del ecualizador, convertidos a array una sola vez
+_EQ_BAND_HZ = np.asarray(BAND_FREQUENCIES, dtype=np.float64)
+_EQ_BAND_Q = np.ones(len(BAND_FREQUENCIES))
+# Fracción de la frecuencia de muestreo por encima de la cual no se coloca ninguna banda
+_EQ_MAX_BAND_FRACTION = 0.45
+
+
+@functools.lru_cache(maxsize=8)
+def _eq_band_trig(samplerate):
+    """
+    cos(w0) y alpha de las bandas del ecualizador, que solo dependen de la frecuencia. En
+    archivos de baja frecuencia de muestreo (22.05 kHz) la banda de 16 kHz queda por encima de
+    Nyquist y el filtro sería inestable, así que las bandas se limitan a un poco por debajo.
+    """
+    samplerate = float(samplerate)
+    band_hz = np.minimum(_EQ_BAND_HZ, _EQ_MAX_BAND_FRACTION * samplerate)
+    return peaking_band_trig(band_hz, _EQ_BAND_Q, samplerate)
+
+
+@functools.lru_cache(maxsize=64)
+def _design_eq_sos(samplerate, gains_db):
+    """
+    Cascada (n_bandas, 6) para las ganancias gains_db (tupla) a esta frecuencia. Cambiar de
+    canción con la misma frecuencia o volver a un preset ya usado no rediseña nada; el array
+    devuelto es compartido y no se debe modificar.
+    """
+    cos_w0, alpha = _eq_band_trig(samplerate)
+    # Todas las bandas en una sola llamada al kernel compilado con Numba (ver ecualizador.py)
+    return peaking_coeffs_from_trig(cos_w0, alpha, np.asarray(gains_db, dtype=np.float64))
+
+
+@functools.lru_cache(maxsize=32)
+def _probe_output_samplerate(device_index, num_channels, file_samplerate):
+    """
+    Primera frecuencia de muestreo que el dispositivo acepta para num_channels canales, en
+    orden de preferencia. Cada check_output_settings es una consulta síncrona a PortAudio, así
+    que el resultado se recuerda hasta que cambia el dispositivo (ver
+    _on_system_audio_device_changed). Si la consulta falla la excepción sale sin guardarse.
+    """
+    device_info = sd.query_devices(device_index)
+
+    prioritized_samplerates = [file_samplerate, 48000, 44100, 96000, 88200]
+    seen_sr = set()
+    unique_prioritized_samplerates = []
+    for sr in prioritized_samplerates:
+        if sr not in seen_sr:
+            unique_prioritized_samplerates.append(sr)
+            seen_sr.add(sr)
+
+    for sr in unique_prioritized_samplerates:
+        try:
+            sd.check_output_settings(
+                device=device_index,
+                samplerate=sr,
+                channels=num_channels,
+                dtype='float32'
+            )
+            print(f"DEBUG: Dispositivo {device_index} soporta samplerate: {sr} Hz (para {num_channels} canales).")
+            return sr
+        except sd.PortAudioError:
+            pass
+
+    default_sr = int(device_info['default_samplerate'])
+    try:
+        sd.check_output_settings(
+            device=device_index,
+            samplerate=default_sr,
+            channels=num_channels,
+            dtype='float32'
+        )
+        print(f"DEBUG: Dispositivo {device_index} soporta su samplerate por defecto: {default_sr} Hz.")
+        return default_sr
+    except sd.PortAudioError:
+        pass
+
+    print(f"ADVERTENCIA: No se encontró una frecuencia de muestreo compatible para el dispositivo {device_index} y {num_channels} canales. Usando la del archivo {file_samplerate}.")
+    return file_samplerate
+
+
+# Filtro de remuestreo: sinc con ventana de Kaiser, parámetros "kaiser_fast" de resampy.
+# Se guarda solo la mitad derecha, con _SINC_PRECISION puntos por cruce por cero.
+_SINC_ZEROS = 16
+_SINC_PRECISION = 512
+_SINC_ROLLOFF = 0.85
+_SINC_BETA = 8.555
+
+
+def _kaiser_sinc_table():
+    n = _SINC_ZEROS * _SINC_PRECISION
+    t = np.arange(n + 1) / _SINC_PRECISION
+    taper = np.kaiser(2 * n + 1, _SINC_BETA)[n:]
+    return _SINC_ROLLOFF * np.sinc(_SINC_ROLLOFF * t) * taper
+
+_SINC_WIN = _kaiser_sinc_table()
+
+
+class BlockResampler:
+    """
+    Remuestrea bloque a bloque con resample_block (Numba) en lugar de una FFT por bloque.
+    Conserva las últimas muestras de entrada para que el filtro vea a ambos lados de cada
+    instante a través de los límites entre bloques; a cambio la salida va retrasada media
+    ventana del filtro (unas pocas decenas de muestras).
+    """
+    def __init__(self, samplerate_in, samplerate_out, channels):
+        # Al bajar la frecuencia el filtro se ensancha para cortar en la nueva Nyquist
+        self.scale = min(1.0, samplerate_out / samplerate_in)
+        self.interp_win = _SINC_WIN * self.scale
+        self.interp_delta = np.append(np.diff(self.interp_win), 0.0)
+        self.half_width = int(np.ceil(_SINC_ZEROS / self.scale)) + 1
+        self._history_len = 2 * self.half_width
+        # Historia seguida del bloque actual; se reserva una vez y solo crece si llega un
+        # bloque mayor que los anteriores
+        self._buffer = np.zeros((self._history_len, channels), dtype=np.float32)
+
+    def process(self, block, step, out):
+        """
+        Escribe en out (n_out, canales) las muestras tomadas cada step muestras de block, a
+        continuación del bloque anterior, sin reservar memoria por bloque.
+        """
+        n_in = len(block)
+        needed = self._history_len + n_in
+        if len(self._buffer) < needed:
+            grown = np.zeros((needed, self._buffer.shape[1]), dtype=np.float32)
+            grown[:self._history_len] = self._buffer[:self._history_len]
+            self._buffer = grown
+        buffer = self._buffer[:needed]
+        buffer[self._history_len:] = block
+        resample_block(buffer, float(self.half_width), step, self.interp_win, self.interp_delta,
+                       _SINC_PRECISION, self.scale, out)
+        buffer[:self._history_len] = buffer[n_in:] # NumPy resuelve el solapamiento si n_in es corto
+
+
+# Bloques ya procesados que el hilo productor puede adelantar al de escritura (~90 ms a 44.1 kHz),
+# y espera de cada lado cuando la cola está llena o vacía
+_AUDIO_RING_BLOCKS = 4
+_AUDIO_RING_POLL_S = 0.002
+
+
+class AudioBlockRing:
+    """
+    Cola circular de un solo productor y un solo consumidor para bloques de audio de tamaño
+    fijo, reservados una vez en un array (n_bloques, frames, canales). Cada lado solo modifica
+    su propio contador y en CPython asignar un int es atómico, así que no hace falta ningún
+    lock ni crear objetos por bloque, a diferencia de queue.Queue.
+    """
+    def __init__(self, n_blocks, block_frames, channels):
+        self.blocks = np.zeros((n_blocks, block_frames, channels), dtype=np.float32)
+        self.frame_pos = np.zeros(n_blocks, dtype=np.int64) # Posición en el archivo tras cada bloque
+        self.finished = False # El productor ya no dejará más bloques
+        self._n_blocks = n_blocks
+        self._written = 0
+        self._read = 0
+
+    def free_slot(self):
+        """Productor: índice del slot donde escribir el siguiente bloque, o None si está llena."""
+        if self._written - self._read >= self._n_blocks:
+            return None
+        return self._written % self._n_blocks
+
+    def commit(self):
+        """Productor: publica el bloque escrito en free_slot()."""
+        self._written += 1
+
+    def ready_slot(self):
+        """Consumidor: índice del siguiente bloque listo, o None si está vacía."""
+        if self._read == self._written:
+            return None
+        return self._read % self._n_blocks
+
+    def release(self):
+        """Consumidor: devuelve al productor el slot de ready_slot()."""
+        self._read += 1
+
+
+# Espectro del visualizador: _SPECTRUM_BARS barras en bandas de frecuencia logarítmicas
+_SPECTRUM_BARS = 50
+_SPECTRUM_FFT_SIZE = 2048 # Cada bloque de 1024 muestras se rellena con ceros hasta este tamaño
+_SPECTRUM_MIN_HZ = 40.0
+_SPECTRUM_MAX_HZ = 16000.0
+_SPECTRUM_MIN_DB = -80.0
+_SPECTRUM_MAX_DB = 0.0
+# Los buffers del visualizador crecen en pasos de este tamaño (px) para no reservar en cada resize
+_VIS_BUFFER_STEP = 256
+# Filas superiores del atlas de cada barra que contienen el borde y las esquinas redondeadas
+_BAR_CAP_ROWS = 4
+
+
+def _spectrum_bar_edges(samplerate, n_fft=_SPECTRUM_FFT_SIZE, n_bars=_SPECTRUM_BARS):
+    """
+    Índices de bin de rfft que delimitan cada barra (n_bars + 1 valores crecientes). En los
+    graves, donde una banda logarítmica sería más estrecha que un bin, cada barra toma al
+    menos un bin.
+    """
+    max_hz = min(_SPECTRUM_MAX_HZ, samplerate / 2.0)
+    freqs = np.geomspace(_SPECTRUM_MIN_HZ, max_hz, n_bars + 1)
+    edges = np.round(freqs * n_fft / samplerate).astype(np.intp)
+    return np.maximum(edges, edges[0] + np.arange(n_bars + 1))
+
+
 class AudioVisualizerWidget(QWidget):
     """
     Widget personalizado para dibujar un visualizador de audio (espectro).
@@ -265,18 +1053,77 @@ class AudioVisualizerWidget(QWidget):
         self.setMinimumHeight(100)
         self.setMinimumWidth(150)
         self.fft_data = np.array([])
+        # Buffer fijo donde se copian las barras ya saneadas de cada bloque, sin reservar uno nuevo
+        self._fft_buf = np.zeros(_SPECTRUM_BARS, dtype=np.float32)
         self.bar_colors = [QColor(80, 160, 220, 200), QColor(60, 140, 200, 200)]
+        # Pinceles y plumas de cada color, para dibujar las barras del atlas
+        self._bar_brushes = [QBrush(color) for color in self.bar_colors]
+        self._bar_pens = [QPen(color.darker(150), 1) for color in self.bar_colors]
+        # Geometría y atlas de las barras para el tamaño actual (ver _update_bar_geometry)
+        self._bar_geometry_size = None
+        self._bar_x = []
+        self._bar_w = 1
+        self._bar_atlas = []
 
         self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
         self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground)
         self._buffer = QPixmap()
+        self._bg_pix = QPixmap() # Fondo liso del tamaño del widget, rehecho solo al redimensionar
+
+        # Los bloques de audio llegan a ~43 por segundo y a ráfagas; los repintados se agrupan
+        # a como mucho uno cada 33 ms (~30 fps), que dibuja siempre los últimos datos recibidos
+        self._repaint_timer = QTimer(self)
+        self._repaint_timer.setSingleShot(True)
+        self._repaint_timer.setInterval(33)
+        self._repaint_timer.timeout.connect(self.update)
 
     def sizeHint(self):
         return QSize(400, 100)
 
-    def update_visualization_data(self, new_fft_data):
-        self.fft_data = np.nan_to_num(new_fft_data, nan=0.0, posinf=0.0, neginf=0.0)
-        self.update()
+    def update_visualization_data(self, bar_levels):
+        """
+        bar_levels: bytes con el nivel de cada barra de 0 a 255, como los empaqueta el hilo de
+        audio; vacío cuando no hay nada que mostrar (al detener o limpiar la playlist).
+        """
+        levels = np.frombuffer(bar_levels, dtype=np.uint8)
+        if levels.size == self._fft_buf.size:
+            np.multiply(levels, 1.0 / 255.0, out=self._fft_buf, casting='unsafe')
+            self.fft_data = self._fft_buf
+        else:
+            self.fft_data = levels / 255.0
+        if not self._repaint_timer.isActive():
+            self._repaint_timer.start()
+
+    def _update_bar_geometry(self, width, height, num_bars):
+        # Solo cambia al redimensionar el widget; se recalcula una vez por tamaño
+        if (width, height) == self._bar_geometry_size and len(self._bar_x) == num_bars:
+            return
+        bar_spacing = 2
+        bar_width = (width - (num_bars + 1) * bar_spacing) / num_bars
+        if bar_width <= 0:
+            bar_width = 1
+            bar_spacing = max(0, (width - num_bars) // (num_bars + 1))
+        self._bar_x = (np.arange(num_bars) * (bar_width + bar_spacing) + bar_spacing).astype(np.int32).tolist()
+        self._bar_w = int(bar_width)
+        max_bar_height = int(height * 0.8)
+        self._bar_atlas = [self._render_bar(color_idx, self._bar_w, max_bar_height)
+                           for color_idx in range(len(self.bar_colors))]
+        self._bar_geometry_size = (width, height)
+
+    def _render_bar(self, color_idx, bar_w, bar_h):
+        """
+        Dibuja una barra de altura máxima con antialiasing, una sola vez por tamaño. Deja un
+        píxel de margen alrededor para el borde de la pluma, que queda centrado en el contorno.
+        """
+        pixmap = QPixmap(bar_w + 2, bar_h + 2)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setBrush(self._bar_brushes[color_idx])
+        painter.setPen(self._bar_pens[color_idx])
+        painter.drawRoundedRect(1, 1, bar_w, bar_h, 2, 2)
+        painter.end()
+        return pixmap
 
     def paintEvent(self, event):
         current_widget_size = self.size()
@@ -284,11 +1131,18 @@ class AudioVisualizerWidget(QWidget):
         if current_widget_size.width() <= 0 or current_widget_size.height() <= 0 or not self.isVisible():
             return
 
-        if self._buffer.size() != current_widget_size or self._buffer.isNull():
+        # Los buffers se reservan redondeando a múltiplos de _VIS_BUFFER_STEP y solo se reemplazan
+        # cuando el widget crece por encima de ellos; se dibuja en la esquina del tamaño actual
+        if (self._buffer.isNull() or self._buffer.width() < current_widget_size.width()
+                or self._buffer.height() < current_widget_size.height()):
             if current_widget_size.width() > 0 and current_widget_size.height() > 0:
-                self._buffer = QPixmap(current_widget_size)
-                self._buffer.fill(Qt.GlobalColor.transparent)
-                print(f"DEBUG: AudioVisualizerWidget: Buffer de visualizador redimensionado a {current_widget_size.width()}x{current_widget_size.height()}.")
+                capacity = QSize(-(-current_widget_size.width() // _VIS_BUFFER_STEP) * _VIS_BUFFER_STEP,
+                                 -(-current_widget_size.height() // _VIS_BUFFER_STEP) * _VIS_BUFFER_STEP)
+                # El fondo cubre el buffer entero en cada frame, así que no hace falta limpiarlo aquí
+                self._buffer = QPixmap(capacity)
+                self._bg_pix = QPixmap(capacity)
+                self._bg_pix.fill(QColor(42, 42, 42))
+                print(f"DEBUG: AudioVisualizerWidget: Buffer de visualizador redimensionado a {capacity.width()}x{capacity.height()}.")
             else:
                 print(f"WARN: AudioVisualizerWidget: Tamaño de widget inválido ({current_widget_size.width()}x{current_widget_size.height()}). No se pudo crear el buffer.")
                 return
@@ -299,22 +1153,16 @@ class AudioVisualizerWidget(QWidget):
             print("ERROR: AudioVisualizerWidget: QPainter no está activo en paintEvent. Abortando dibujo.")
             return
 
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.fillRect(self.rect(), QColor(42, 42, 42))
+        painter.setClipRect(self.rect())
+        painter.drawPixmap(0, 0, self._bg_pix)
 
         # Initialize display_data to an empty array to prevent UnboundLocalError
         display_data = np.array([])
 
         if self.fft_data.size > 0:
-            width = self.width()
             height = self.height()
-            num_bars = 50
-            bar_spacing = 2
-            bar_width = (width - (num_bars + 1) * bar_spacing) / num_bars
-
-            if bar_width <= 0:
-                bar_width = 1
-                bar_spacing = max(0, (width - num_bars) // (num_bars + 1))
+            num_bars = _SPECTRUM_BARS
+            self._update_bar_geometry(self.width(), height, num_bars)
 
             # self.fft_data already contains the normalized magnitudes (0 to 1)
             # So we directly use it, and pad if necessary
@@ -322,17 +1170,23 @@ class AudioVisualizerWidget(QWidget):
                 display_data = self.fft_data[:num_bars]
             else:
                 display_data = np.pad(self.fft_data, (0, num_bars - self.fft_data.size), 'constant', constant_values=0)
-            
-            for i, val in enumerate(display_data):
-                bar_height = val * height * 0.8
-                x = i * (bar_width + bar_spacing) + bar_spacing
-                y = height - bar_height
 
-                color = self.bar_colors[i % len(self.bar_colors)]
-                painter.setBrush(QBrush(color))
-                painter.setPen(QPen(color.darker(150), 1))
-
-                painter.drawRoundedRect(int(x), int(y), int(bar_width), int(bar_height), 2, 2)
+            # Cada barra se copia del atlas (ya rasterizado con antialiasing) en lugar de trazar
+            # un rectángulo redondeado por barra: las filas superiores del atlas dan las esquinas
+            # redondeadas y el resto de la barra sale de su parte inferior
+            bar_heights = (display_data * (height * 0.8)).astype(np.int32).tolist()
+            bar_x = self._bar_x
+            blit_w = self._bar_w + 2
+            n_colors = len(self._bar_atlas)
+            for i in range(num_bars):
+                atlas = self._bar_atlas[i % n_colors]
+                rows = bar_heights[i] + 2 # Con el píxel de margen arriba y abajo
+                top_rows = min(_BAR_CAP_ROWS, rows // 2)
+                bottom_rows = rows - top_rows
+                x = bar_x[i] - 1
+                y = height - bar_heights[i] - 1
+                painter.drawPixmap(x, y, atlas, 0, 0, blit_w, top_rows)
+                painter.drawPixmap(x, y + top_rows, atlas, 0, atlas.height() - bottom_rows, blit_w, bottom_rows)
         else:
             painter.setPen(QPen(QColor(150, 150, 150)))
             painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Cargando audio para visualización...")
@@ -341,7 +1195,7 @@ class AudioVisualizerWidget(QWidget):
 
         target_painter = QPainter(self)
         if target_painter.isActive():
-            target_painter.drawPixmap(0, 0, self._buffer)
+            target_painter.drawPixmap(0, 0, self._buffer, 0, 0, current_widget_size.width(), current_widget_size.height())
             target_painter.end()
 
 
@@ -350,10 +1204,15 @@ class MusicPlayer(QMainWindow):
     REPEAT_CURRENT = 1
     REPEAT_ALL = 2
 
+    # Periodo (ms) con el que la UI consulta la posición del hilo de audio (~10 Hz)
+    UI_UPDATE_INTERVAL_MS = 100
+    # Avance mínimo (ms) para mover el slider de posición; por debajo no se aprecia el cambio
+    SLIDER_MIN_STEP_MS = 250
+
     update_position_signal = pyqtSignal(int)
     update_duration_signal = pyqtSignal(int)
     update_playback_state_signal = pyqtSignal(str)
-    update_visualizer_signal = pyqtSignal(np.ndarray)
+    update_visualizer_signal = pyqtSignal(bytes) # Un byte (0-255) por barra, ver _audio_playback_thread_main
     devices_updated_signal = pyqtSignal()
     audio_error_signal = pyqtSignal(str, str) # New signal for audio errors (title, message)
     restart_playback_signal = pyqtSignal(int) # New signal to trigger delayed restart
@@ -372,157 +1231,33 @@ class MusicPlayer(QMainWindow):
         self.setPalette(pal)
 
     def apply_styles(self):
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1a1a1a;
-            }
-            QListWidget {
-                background-color: #2b2b2b;
-                border: 1px solid #444;
-                border-radius: 10px;
-                color: #ddd;
-                padding: 5px;
-            }
-            QListWidget::item {
-                padding: 8px;
-                margin-bottom: 2px;
-                border-radius: 5px;
-            }
-            QListWidget::item:selected {
-                background-color: #50b8f0;
-                color: black;
-            }
-            QLabel {
-                color: #ddd;
-            }
-            QLabel#albumArt {
-                background-color: #3a3a3a;
-                border: 1px solid #555;
-                border-radius: 10px;
-                qproperty-alignment: AlignCenter;
-                color: #bbb;
-                font-size: 16px;
-            }
-            QSlider::groove:horizontal {
-                height: 8px;
-                background: #555;
-                border-radius: 4px;
-            }
-            QSlider::handle:horizontal {
-                width: 16px;
-                height: 16px;
-                background: #50b8f0;
-                border-radius: 8px;
-                margin: -4px 0;
-            }
-            QSlider::add-page:horizontal {
-                background: #888;
-            }
-            QSlider::sub-page:horizontal {
-                background: #50b8f0;
-            }
-            QSlider::groove:vertical {
-                width: 8px;
-                background: #555;
-                border-radius: 4px;
-            }
-            QSlider::handle:vertical {
-                width: 16px;
-                height: 16px;
-                background: #50b8f0;
-                border-radius: 8px;
-                margin: 0 -4px;
-            }
-            QSlider::add-page:vertical {
-                background: #888;
-            }
-            QSlider::sub-page:vertical {
-                background: #50b8f0;
-            }
-            QPushButton {
-                background: #333;
-                border: none;
-                border-radius: 8px;
-                padding: 10px 15px;
-                color: white;
-                font-size: 14px;
-            }
-            QPushButton:hover {
-                background: #444;
-            }
-            QPushButton:pressed {
-                background: #222;
-            }
-            QPushButton[checkable="true"][checked="true"] {
-                background: #50b8f0;
-            }
-            QLineEdit {
-                background-color: #2b2b2b;
-                border: 1px solid #444;
-                border-radius: 8px;
-                color: #ddd;
-                padding: 8px;
-                font-size: 14px;
-            }
-            QLineEdit:focus {
-                border: 1px solid #50b8f0;
-            }
-            QToolButton {
-                background: #333;
-                border: none;
-                border-radius: 8px;
-                padding: 10px 15px;
-                color: white;
-                font-size: 14px;
-            }
-            QToolButton:hover {
-                background: #444;
-            }
-            QToolButton:pressed {
-                background: #222;
-            }
-            QToolButton::menu-indicator {
-                image: none;
-            }
-            QMenu {
-                background-color: #2b2b2b;
-                border: 1px solid #444;
-                border-radius: 5px;
-                color: #ddd;
-            }
-            QMenu::item {
-                padding: 8px 20px 8px 15px;
-                background-color: transparent;
-            }
-            QMenu::item:selected {
-                background-color: #50b8f0;
-                color: black;
-            }
-        """)
+        self.setStyleSheet(_MAIN_STYLESHEET)
 
     def _get_band_frequencies(self):
-        return [31, 62, 125, 250, 500, 1000, 2000, 4000, 8000, 16000]
-
-    def _design_band_filter(self, center_freq, gain_db, Q_factor=1.0):
-        if iirfilter is None or np is None or self._file_samplerate == 0:
-            return [1.0], [1.0]
+        return BAND_FREQUENCIES # Las mismas bandas que EqualizerWindow
 
-        A = 10**(gain_db / 40.0)
-        w0 = 2 * np.pi * center_freq / self._file_samplerate
-        alpha = np.sin(w0) / (2 * Q_factor)
-
-        b0 = 1 + alpha * A
-        b1 = -2 * np.cos(w0)
-        b2 = 1 - alpha * A
-
-        a0 = 1 + alpha / A
-        a1 = -2 * np.cos(w0)
-        a2 = 1 - alpha / A
-
-        b = np.array([b0, b1, b2]) / a0
-        a = np.array([a0, a1, a2]) / a0
+    def _set_eq_filters(self, gains_db):
+        """
+        Diseña las bandas del ecualizador y reinicia sus estados. Deja la cascada completa en
+        _eq_sos (n_bandas, 6), que usan tanto sos_cascade como scipy.signal.sosfilt. Sin
+        frecuencia de muestreo (ninguna canción cargada) no hay filtros y _eq_sos es None.
+        """
+        if self._file_samplerate == 0:
+            self._eq_sos = None
+            self.filter_states = []
+            return
 
-        return b, a
+        sos = _design_eq_sos(self._file_samplerate, tuple(float(gain_db) for gain_db in gains_db))
+        self._eq_sos = sos
+        if self._file_channels > 0:
+            # (n_bandas, 2, canales): el zi de sosfilt con axis=0, el mismo que usa sos_cascade.
+            # Con los canales del archivo: un archivo mono se filtra una sola vez. Estados y
+            # coeficientes siguen en float64 a propósito: los polos de las bandas graves están
+            # muy cerca de 1 y en float32 el error del filtro sube a unos -50 dB a 96 kHz. El
+            # audio sí queda en float32; solo cada muestra se amplía dentro del bucle del filtro.
+            self.filter_states = np.zeros((len(sos), 2, self._file_channels), dtype=np.float64)
+        else:
+            self.filter_states = []
 
     def _update_ui_from_threads(self):
         if self.total_frames > 0 and self._file_samplerate > 0:
@@ -543,62 +1278,11 @@ class MusicPlayer(QMainWindow):
                     self.stop_playback(final_stop=True)
             elif self._repeat_mode == self.REPEAT_ALL:
                 print("DEBUG: Repetir toda la playlist.")
-                if self._shuffle_mode and self.shuffled_playlist:
-                    current_shuffled_idx = self.current_shuffled_index
-                    next_shuffled_idx = (current_shuffled_idx + 1) % len(self.shuffled_playlist)
-                    if next_shuffled_idx == len(self.shuffled_playlist) and current_shuffled_idx == len(self.shuffled_playlist) - 1:
-                        print("DEBUG: Fin de playlist aleatoria, reiniciando al principio.")
-                        self.rebuild_shuffled_playlist()
-                        next_file = self.shuffled_playlist[0]
-                        self.current_shuffled_index = 0
-                    else:
-                        next_file = self.shuffled_playlist[next_shuffled_idx]
-                        self.current_shuffled_index = next_shuffled_idx
-                    self.load_and_play(next_file, auto_start_playback=True)
-                    self.current_index = self.playlist.index(next_file)
-                    self.track_list.setCurrentRow(self.current_index)
-                elif self.playlist:
-                    current_idx = self.current_index
-                    next_idx = (current_idx + 1) % len(self.playlist)
-                    next_file = self.playlist[next_idx]
-                    self.current_index = next_idx
-                    self.load_and_play(next_file, auto_start_playback=True)
-                    self.track_list.setCurrentRow(self.current_index)
-                else:
+                if not self._advance(1, wrap=True):
                     self.stop_playback(final_stop=True)
             else:
                 print("DEBUG: Fin de canción. Modo no repetición.")
-                next_song_exists = False
-                next_file = None
-                next_ui_index = -1
-                if self._shuffle_mode and self.shuffled_playlist:
-                    current_shuffled_idx = self.current_shuffled_index
-                    next_shuffled_idx = current_shuffled_idx + 1
-                    if next_shuffled_idx < len(self.shuffled_playlist):
-                        next_song_exists = True
-                        next_file = self.shuffled_playlist[next_shuffled_idx]
-                        self.current_shuffled_index = next_shuffled_idx
-                        next_ui_index = self.playlist.index(next_file)
-                        print(f"DEBUG: Reproduciendo siguiente en modo aleatorio: {os.path.basename(next_file)}")
-                    else:
-                        print("DEBUG: Fin de playlist aleatoria (NO_REPEAT).")
-                elif self.playlist:
-                    current_idx = self.current_index
-                    next_idx = current_idx + 1
-                    if next_idx < len(self.playlist):
-                        next_song_exists = True
-                        next_file = self.playlist[next_idx]
-                        self.current_index = next_idx
-                        next_ui_index = next_idx
-                        print(f"DEBUG: Reproduciendo siguiente en modo secuencial: {os.path.basename(next_file)}")
-                    else:
-                        print("DEBUG: Fin de playlist secuencial (NO_REPEAT).")
-
-                if next_song_exists and next_file:
-                    self.load_and_play(next_file, auto_start_playback=True)
-                    if next_ui_index != -1:
-                        self.track_list.setCurrentRow(next_ui_index)
-                else:
+                if not self._advance(1, wrap=False):
                     print("DEBUG: No hay más canciones para reproducir. Deteniendo reproducción.")
                     self.stop_playback(final_stop=True)
                     self.update_playback_status_label("StoppedState")
@@ -608,7 +1292,7 @@ class MusicPlayer(QMainWindow):
             self.current_frame = 0
             self.update_position_signal.emit(0)
             self.update_duration_signal.emit(0)
-            self.update_visualizer_signal.emit(np.array([]))
+            self.update_visualizer_signal.emit(b"")
             self.update_playback_status_label("StoppedState")
 
         if self.audio_playback_thread and not self.audio_playback_thread.is_alive() and not self.stop_playback_event.is_set():
@@ -616,7 +1300,31 @@ class MusicPlayer(QMainWindow):
             self.audio_playback_thread = None
 
 
+    def _clear_album_art(self):
+        # Evitar borrar y re-escribir la etiqueta (y repintarla) si ya no tiene carátula,
+        # p. ej. al saltar rápidamente entre canciones sin arte
+        if self._album_art_cleared:
+            return
+        self.album_art.clear()
+        self.album_art.setText("No Album Art")
+        self._album_art_cleared = True
+
+    def _set_play_icon(self, playing):
+        # Muestra "pausa" mientras se reproduce y "play" en cualquier otro estado. Saltar pistas
+        # seguidas pide el mismo icono una y otra vez; setIcon solo se llama si cambia.
+        if playing == self._play_icon_is_pause:
+            return
+        self._play_icon_is_pause = playing
+        self.btn_play.setIcon(self.icon_pause if playing else self.icon_play)
+
     def set_and_save_volume(self, value):
+        # El hilo de audio lee este valor en cada bloque; guardarlo en QSettings en cada
+        # paso del slider es caro, así que la escritura se agrupa con _volume_save_timer.
+        self._volume_linear = value / 100.0
+        self._volume_save_timer.start()
+
+    def _save_volume(self):
+        value = self.vol_slider.value()
         self.settings.setValue("last_volume", value)
         print(f"Volumen ajustado a: {value}%")
 
@@ -660,7 +1368,7 @@ class MusicPlayer(QMainWindow):
         self.seek_position_audio(seek_ms)
 
     def seek_position_audio(self, target_ms):
-        if sf is None or sd is None or self.current_audio_data_original is None:
+        if sf is None or sd is None or self._stream_file is None:
             print("DEBUG: Librerías DSP o datos de audio no disponibles para buscar.")
             return
 
@@ -687,106 +1395,98 @@ class MusicPlayer(QMainWindow):
 
 
     def update_position_ui(self, pos_ms):
-        self.slider.blockSignals(True)
-        self.slider.setValue(pos_ms)
-        self.slider.blockSignals(False)
+        # No mover el slider mientras el usuario lo arrastra, ni por avances que no se ven
+        if not self.slider.isSliderDown() and abs(pos_ms - self.slider.value()) > self.SLIDER_MIN_STEP_MS:
+            self.slider.blockSignals(True)
+            self.slider.setValue(pos_ms)
+            self.slider.blockSignals(False)
         s = pos_ms // 1000
-        m, s = divmod(s, 60)
-        self.lbl_elapsed.setText(f"{m:02d}:{s:02d}")
+        if s == self._last_elapsed_s:
+            return # El texto "MM:SS" no cambió; evitar el setText y su repintado
+        self._last_elapsed_s = s
+        self.lbl_elapsed.setText(self.format_time(pos_ms))
 
     def update_duration_ui(self, dur_ms):
+        # La duración solo cambia al cambiar de canción, pero se recibe en cada tick de la UI
+        if dur_ms == self._last_duration_ms:
+            return
+        self._last_duration_ms = dur_ms
         self.slider.setRange(0, dur_ms)
-        s = dur_ms // 1000
-        m, s = divmod(s, 60)
-        self.lbl_duration.setText(f"{m:02d}:{s:02d}")
+        self.lbl_duration.setText(self.format_time(dur_ms))
 
-    def update_metadata(self, file_path):
-        title = os.path.splitext(os.path.basename(file_path))[0]
-        artist = '-'
-        album = '-'
-        tracknum = '-'
-        album_art_data = None
+    @staticmethod
+    def format_time(ms):
+        m, s = divmod(ms // 1000, 60)
+        return f"{m:02d}:{s:02d}"
 
-        current_tracknum_raw = tracknum
+    def update_metadata(self, file_path):
+        # Un seek o la restauración de sesión vuelven a cargar la misma canción; sus etiquetas
+        # y carátula ya están en pantalla, así que no se releen ni se reescalan.
+        if not file_path or file_path == self._metadata_file:
+            return
+        self._metadata_file = file_path
+
+        # Carátula ya mostrada en esta sesión: se pinta al instante sin tocar el disco
+        self._metadata_art_key = _art_cache_key(file_path, self.album_art.size())
+        cached_pixmap = QPixmapCache.find(self._metadata_art_key)
+        if cached_pixmap is not None:
+            self.album_art.setPixmap(cached_pixmap)
+            self._album_art_cleared = False
+
+        # Al saltar canciones rápido, la lectura de la anterior puede seguir en la cola del
+        # QThreadPool sin haber empezado: se retira para no leer un archivo que ya no se mostrará
+        if self._metadata_worker is not None:
+            try:
+                QThreadPool.globalInstance().tryTake(self._metadata_worker)
+            except RuntimeError:
+                pass # Ya terminó y Qt la eliminó
+        self._metadata_request += 1
+
+        # Leer etiquetas y decodificar la carátula en el QThreadPool; la UI se actualiza
+        # en _on_metadata_ready cuando el resultado llega al hilo principal.
+        worker = MetadataWorker(file_path, self.album_art.size(), read_art=cached_pixmap is None,
+                                request_id=self._metadata_request)
+        worker.signals.ready.connect(self._on_metadata_ready)
+        self._metadata_worker = worker
+        QThreadPool.globalInstance().start(worker)
+
+    def _on_metadata_ready(self, meta):
+        # Solo vale la respuesta a la última petición (un A -> B -> A rápido pide A dos veces),
+        # y solo si la canción sigue mostrándose
+        if meta['request_id'] != self._metadata_request or meta['path'] != self._metadata_file:
+            return
+        self._metadata_worker = None
 
-        try:
-            audio = None
-            if file_path.lower().endswith('.mp3'):
-                audio = MP3(file_path)
-            elif file_path.lower().endswith('.flac'):
-                audio = FLAC(file_path)
-            elif file_path.lower().endswith(('.ogg', '.oga')):
-                audio = OggVorbis(file_path)
-
-            if audio and audio.tags:
-                title_tag = audio.tags.get('title')
-                if isinstance(title_tag, list) and title_tag:
-                    title = str(title_tag[0])
-                elif 'TIT2' in audio.tags:
-                    title = str(audio.tags.get('TIT2'))
-
-                artist_tag = audio.tags.get('artist')
-                if isinstance(artist_tag, list) and artist_tag:
-                    artist = str(artist_tag[0])
-                elif 'TPE1' in audio.tags:
-                    artist = str(audio.tags.get('TPE1'))
-
-                album_tag = audio.tags.get('album')
-                if isinstance(album_tag, list) and album_tag:
-                    album = str(album_tag[0])
-                elif 'TALB' in audio.tags:
-                    album = str(audio.tags.get('TALB'))
-
-                tracknum_tag = audio.tags.get('tracknumber')
-                if isinstance(tracknum_tag, list) and tracknum_tag:
-                    current_tracknum_raw = str(tracknum_tag[0])
-                elif 'TRCK' in audio.tags:
-                    current_tracknum_raw = str(audio.tags.get('TRCK'))
-
-                if isinstance(audio.tags, ID3):
-                    for k, v in audio.tags.items():
-                        if k.startswith('APIC') and isinstance(v, APIC):
-                            album_art_data = v.data
-                            break
-                elif hasattr(audio.tags, 'pictures') and audio.tags.pictures:
-                    for pic in audio.tags.pictures:
-                        if pic.type == 3:
-                            album_art_data = pic.data
-                            break
-
-        except ID3NoHeaderError:
-            print(f"Advertencia: No se encontraron etiquetas ID3 en {file_path}.")
-        except Exception as e:
-            print(f"Error general al leer metadatos de {file_path}: {e}")
+        title = meta['title']
+        artist = meta['artist']
+        album = meta['album']
 
-        if isinstance(current_tracknum_raw, str) and '/' in current_tracknum_raw:
-            tracknum = current_tracknum_raw.split('/')[0]
-        else:
-            tracknum = str(current_tracknum_raw)
+        # Aprovechar la lectura para la búsqueda en la playlist
+        self._remember_search_tags({meta['path']: _search_tags(meta)})
 
         self.lbl_title.setText(f"Title: {title}")
         self.lbl_artist.setText(f"Artist: {artist}")
         self.lbl_album.setText(f"Album: {album}")
-        self.lbl_track.setText(f"Track: {tracknum}")
-
-        pix = None
-        if album_art_data:
-            image = QImage()
-            if image.loadFromData(album_art_data):
-                pix = QPixmap.fromImage(image)
-            else:
-                print("No se pudo cargar la imagen de la carátula desde los datos.")
-
-        if pix and not pix.isNull():
-            pix = pix.scaled(self.album_art.size(), Qt.AspectRatioMode.KeepAspectRatio,
-                             Qt.TransformationMode.SmoothTransformation)
-            self.album_art.setPixmap(pix)
+        self.lbl_track.setText(f"Track: {meta['tracknum']}")
+
+        image = meta['image']
+        if image is not None and not image.isNull():
+            # Solo la conversión a QPixmap debe hacerse en el hilo de la UI
+            pixmap = QPixmap.fromImage(image)
+            QPixmapCache.insert(self._metadata_art_key, pixmap)
+            self.album_art.setPixmap(pixmap)
+            self._album_art_cleared = False
+        elif QPixmapCache.find(self._metadata_art_key) is not None:
+            pass # La carátula se puso desde QPixmapCache en update_metadata
         else:
-            self.album_art.clear()
-            self.album_art.setText("No Album Art")
+            self._clear_album_art()
 
         self.update_window_title()
 
+    def _display_basename(self, file_path):
+        name = self._basename_cache.get(file_path)
+        return name if name is not None else os.path.basename(file_path)
+
     def update_window_title(self):
         current_title = "Modern PyQt6 Music Player"
         displayed_title_text = self.lbl_title.text()
@@ -796,9 +1496,9 @@ class MusicPlayer(QMainWindow):
             if actual_title and actual_title != "-":
                 current_title = f"Playing: {actual_title} - Modern PyQt6 Music Player"
             elif self.current_playback_file:
-                current_title = f"Playing: {os.path.basename(self.current_playback_file)} - Modern PyQt6 Music Player"
+                current_title = f"Playing: {self._display_basename(self.current_playback_file)} - Modern PyQt6 Music Player"
         elif self.current_playback_file:
-             current_title = f"Playing: {os.path.basename(self.current_playback_file)} - Modern PyQt6 Music Player"
+             current_title = f"Playing: {self._display_basename(self.current_playback_file)} - Modern PyQt6 Music Player"
 
         self.setWindowTitle(current_title)
 
@@ -817,68 +1517,88 @@ class MusicPlayer(QMainWindow):
             self.lbl_status.setStyleSheet("color: #aaa; font-size: 12px; font-style: italic;")
 
     def open_equalizer_window(self):
-        # Pasar los ajustes actuales del ecualizador a la ventana del ecualizador
-        dialog = EqualizerWindow(self, initial_settings=self.equalizer_settings)
-        # Conectar la señal eq_params_changed (que emite el diccionario completo)
-        dialog.eq_params_changed.connect(self.apply_equalizer_settings)
-        dialog.exec()
+        # La ventana se construye (paleta, estilos, widgets) una sola vez; al cerrarse
+        # QDialog solo se oculta, así que en las siguientes aperturas se reutiliza.
+        if self._eq_dialog is None:
+            # Pasar los ajustes actuales del ecualizador a la ventana del ecualizador
+            self._eq_dialog = EqualizerWindow(self, initial_settings=self.equalizer_settings)
+            # Conectar la señal eq_params_changed (que emite el array de parámetros)
+            self._eq_dialog.eq_params_changed.connect(self.apply_equalizer_settings)
+        else:
+            self._eq_dialog.set_initial_settings(self.equalizer_settings)
+        self._eq_dialog.exec()
 
     def apply_equalizer_settings(self, settings):
-        # 'settings' ahora es el diccionario completo que la EqualizerWindow emite
-        # Necesitamos extraer solo las ganancias para self.equalizer_settings
-        self.equalizer_settings = [val['gain'] for key, val in settings.items()]
+        # 'settings' es el array float32 (n_bandas, 3) [gain, q, freq] que emite la EqualizerWindow
+        # Necesitamos extraer solo las ganancias (columna 0) para self.equalizer_settings.
+        # Se redondean a 0.1 dB para quitar el error de representación de float32.
+        self.equalizer_settings = [round(float(gain_db), 1) for gain_db in settings[:, 0]]
         self.settings.setValue("equalizer_settings", self.equalizer_settings)
         print(f"Configuraciones del ecualizador recibidas y guardadas: {self.equalizer_settings}")
 
-        new_filters = []
-        for i, gain_db in enumerate(self.equalizer_settings):
-            # Usar self._get_band_frequencies()[i] para obtener la frecuencia de la banda
-            new_filters.append(self._design_band_filter(self._get_band_frequencies()[i], gain_db))
-
-        self.equalizer_filters = new_filters
-
-        # Reiniciar estados de filtro para los nuevos datos y canales
-        # Esto solo se hace si audio_channels_original es conocido (después de cargar una canción)
-        if self.audio_channels_original > 0:
-            self.filter_states = [np.zeros((max(len(b), len(a)) - 1, self.audio_channels_original)) for b, a in self.equalizer_filters]
-        else:
-            # Si no hay audio cargado, los estados se reinician como vacíos
-            self.filter_states = []
+        # Rediseña las bandas y reinicia sus estados (vacíos si aún no hay audio cargado)
+        self._set_eq_filters(self.equalizer_settings)
         print("Filtros del ecualizador actualizados.")
 
-    def add_files_to_playlist(self, files):
-        # Validate and filter files before adding
+    def add_files_to_playlist(self, files, scanned=False, signatures=None):
+        # Validar los archivos en una sola pasada. Los que llegan de ScanWorker (scanned) ya
+        # pasaron por la extensión y por DirEntry.is_file() con el stat de os.scandir, así
+        # que no se vuelve a separar la extensión ni a hacer otro stat por archivo.
+        # signatures: {ruta: firma} de ScanWorker, que los workers usan sin repetir el stat.
         valid_files = []
+        add_valid = valid_files.append
+        known_files = self._all_files_set
+        basenames = self._basename_cache
+        basenames_lower = self._basename_lower_cache
         for f in files:
-            if os.path.isfile(f) and f not in self.all_files and f.lower().endswith(('.mp3', '.wav', '.ogg', '.oga', '.flac')):
-                valid_files.append(f)
-            elif f in self.all_files:
+            if f not in known_files and (scanned or (os.path.splitext(f)[1].lower() in _AUDIO_EXTS
+                                                      and os.path.isfile(f))):
+                name = os.path.basename(f)
+                basenames[f] = name
+                basenames_lower[f] = name.lower()
+                add_valid(f)
+                known_files.add(f) # También descarta duplicados dentro de la misma llamada
+            elif f in known_files:
                 print(f"Advertencia: Archivo ya en la playlist: {os.path.basename(f)}")
             else:
                 print(f"Advertencia: Archivo no válido o no soportado: {os.path.basename(f)}")
 
         if valid_files:
-            for f in valid_files:
-                self.all_files.append(f)
-                self.playlist.append(f)
-
-                duration_string = "00:00"
-                if sf:
-                    try:
-                        info = sf.info(f)
-                        total_seconds = int(info.duration)
-                        minutes = total_seconds // 60
-                        seconds = total_seconds % 60
-                        duration_string = f"{minutes:02d}:{seconds:02d}"
-                    except Exception as e:
-                        print(f"Error al obtener la duración de {f} con soundfile: {e}")
-
-                display_text = f"{os.path.basename(f)} ({duration_string})"
-                self.track_list.addItem(display_text)
+            # Las duraciones se muestran como "--:--" hasta que DurationWorker las trae del
+            # índice de la biblioteca o de la cabecera, sin ningún stat en el hilo de la UI
+            display_texts = [self._track_item_text(f, None) for f in valid_files]
+
+            # Añadir todas las rutas de una vez en lugar de una por una
+            self._path_to_index.update(zip(valid_files, range(len(self.playlist), len(self.playlist) + len(valid_files))))
+            self.all_files.extend(valid_files)
+            self.playlist.extend(valid_files)
+
+            # Insertar todos los elementos de una vez con el repintado desactivado,
+            # en lugar de un addItem (y un relayout) por canción.
+            self.track_list.setUpdatesEnabled(False)
+            try:
+                self.track_list.addItems(display_texts)
+            finally:
+                self.track_list.setUpdatesEnabled(True)
 
+            self._shuffle_dirty = True # La lista aleatoria no incluye las canciones nuevas
             if self._shuffle_mode:
                 self.rebuild_shuffled_playlist()
 
+            # Obtener en segundo plano las etiquetas que usará la búsqueda; TagPrefetchWorker
+            # consulta el índice de la biblioteca y solo lee los archivos que han cambiado
+            prefetch = TagPrefetchWorker((f for f in valid_files if f not in self.meta_cache),
+                                         self._library_db_path, signatures)
+            if prefetch.file_paths:
+                prefetch.signals.batch_ready.connect(self._store_search_tags)
+                QThreadPool.globalInstance().start(prefetch)
+
+            if sf or self._library_db_path is not None:
+                duration_worker = DurationWorker(valid_files, self._library_db_path, signatures)
+                if duration_worker.file_paths:
+                    duration_worker.signals.batch_ready.connect(self._store_track_durations)
+                    QThreadPool.globalInstance().start(duration_worker)
+
             if self.current_index == -1 and self.playlist:
                 pass
             print(f"Añadidos {len(valid_files)} archivos a la playlist.")
@@ -886,7 +1606,22 @@ class MusicPlayer(QMainWindow):
             print("No se añadieron archivos válidos a la playlist.")
 
 
+    def _track_item_text(self, file_path, duration_ms):
+        """Texto de la fila de file_path; duration_ms None mientras no se conoce la duración."""
+        duration_string = "--:--" if duration_ms is None else self.format_time(duration_ms)
+        return f"{self._display_basename(file_path)} ({duration_string})"
+
+    def _store_track_durations(self, durations):
+        # Duraciones de DurationWorker (que ya guardó en el índice las leídas): a las filas que
+        # siguen en la playlist
+        for file_path, duration_ms in durations.items():
+            row = self._path_to_index.get(file_path)
+            if row is not None:
+                self.track_list.item(row).setText(
+                    self._track_item_text(file_path, 0 if duration_ms is None else duration_ms))
+
     def open_files(self):
+        from PyQt6.QtWidgets import QFileDialog # Solo se usa al abrir el diálogo
         files, _ = QFileDialog.getOpenFileNames(
             self, 'Abrir Archivos de Música', '', 'Audio Files (*.mp3 *.wav *.ogg *.flac)'
         )
@@ -899,6 +1634,7 @@ class MusicPlayer(QMainWindow):
                 self.settings.setValue("last_opened_position", 0)
 
     def open_folder(self):
+        from PyQt6.QtWidgets import QFileDialog # Solo se usa al abrir el diálogo
         folder_path = QFileDialog.getExistingDirectory(self, 'Abrir Carpeta de Música')
         if folder_path:
             self.scan_folder_recursive(folder_path)
@@ -906,17 +1642,37 @@ class MusicPlayer(QMainWindow):
             self.settings.setValue("last_opened_song", "")
             self.settings.setValue("last_opened_position", 0)
 
-    def scan_folder_recursive(self, folder_path):
-        supported_extensions = ('.mp3', '.wav', '.ogg', '.oga', '.flac')
-        found_files = []
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith(supported_extensions):
-                    full_path = os.path.join(root, file)
-                    found_files.append(full_path)
-        self.add_files_to_playlist(found_files)
+    def scan_folder_recursive(self, folder_path, on_finished=None):
+        # El recorrido se hace en un hilo del QThreadPool para no congelar la UI con carpetas
+        # grandes o de red; cada lote se añade a la playlist en cuanto llega.
+        worker = ScanWorker(folder_path, frozenset(self._all_files_set))
+        worker.signals.batch_ready.connect(lambda batch: self._on_scan_batch(worker, batch))
+        worker.signals.finished.connect(lambda: self._on_scan_finished(worker, on_finished))
+        self._scan_workers.append(worker) # Mantener vivas las señales hasta que termine
+        print(f"DEBUG: scan_folder_recursive: Escaneando {folder_path} en segundo plano.")
+        QThreadPool.globalInstance().start(worker)
+
+    def _on_scan_batch(self, worker, batch):
+        if worker.cancelled:
+            return # Lote que ya estaba en la cola de eventos cuando se canceló el escaneo
+        self.add_files_to_playlist(batch, scanned=True, signatures=batch)
+
+    def _on_scan_finished(self, worker, on_finished):
+        if worker in self._scan_workers:
+            self._scan_workers.remove(worker)
+        if worker.cancelled:
+            return
+        print(f"DEBUG: scan_folder_recursive: Escaneo de {worker.folder_path} completado.")
+        if on_finished is not None:
+            on_finished()
+
+    def _cancel_scans(self):
+        # La playlist se vacía o se reemplaza: los escaneos en curso ya no deben añadir nada
+        for worker in self._scan_workers:
+            worker.cancel()
 
     def save_playlist(self):
+        from PyQt6.QtWidgets import QFileDialog # Solo se usa al abrir el diálogo
         if not self.playlist:
             self._show_message_box("Info", "No hay canciones en la playlist para guardar.")
             return
@@ -935,34 +1691,46 @@ class MusicPlayer(QMainWindow):
                 self._show_message_box("Error", f"Error al guardar la playlist: {e}")
 
     def load_playlist(self):
+        from PyQt6.QtWidgets import QFileDialog # Solo se usa al abrir el diálogo
         file_name, _ = QFileDialog.getOpenFileName(
             self, 'Cargar Playlist', '', 'M3U Playlists (*.m3u);;All Files (*)'
         )
         if file_name:
-            loaded_files = []
             try:
+                # Primero las rutas (sin repetir), después todas las comprobaciones de existencia
+                # en paralelo en lugar de un stat tras otro
+                m3u_dir = os.path.dirname(file_name)
+                entries = {} # {ruta absoluta: línea del M3U}, en el orden del archivo
                 with open(file_name, 'r', encoding='utf-8') as f:
                     for line in f:
                         line = line.strip()
                         if line and not line.startswith('#'):
-                            if os.path.isabs(line):
-                                if os.path.exists(line):
-                                    loaded_files.append(line)
-                                else:
-                                    print(f"Advertencia: Archivo no encontrado al cargar playlist: {line}")
-                            else:
-                                m3u_dir = os.path.dirname(file_name)
-                                abs_path = os.path.join(m3u_dir, line)
-                                if os.path.exists(abs_path):
-                                    loaded_files.append(abs_path)
-                                else:
-                                    print(f"Advertencia: Archivo relativo no encontrado al cargar playlist: {line} (buscado en {abs_path})")
+                            entries.setdefault(line if os.path.isabs(line) else os.path.join(m3u_dir, line), line)
+
+                with ThreadPoolExecutor(max_workers=_M3U_STAT_WORKERS) as executor:
+                    exists = list(executor.map(os.path.exists, entries))
+
+                loaded_files = []
+                for (path, line), path_exists in zip(entries.items(), exists):
+                    if path_exists:
+                        loaded_files.append(path)
+                    elif path == line:
+                        print(f"Advertencia: Archivo no encontrado al cargar playlist: {line}")
+                    else:
+                        print(f"Advertencia: Archivo relativo no encontrado al cargar playlist: {line} (buscado en {path})")
 
                 if loaded_files:
                     self.stop_playback()
+                    self._cancel_scans()
                     self.playlist.clear()
                     self.track_list.clear()
                     self.all_files.clear()
+                    self._all_files_set.clear()
+                    self._path_to_index.clear()
+                    self._basename_cache.clear()
+                    self._basename_lower_cache.clear()
+                    self.meta_cache.clear()
+                    self._search_strings.clear()
                     self.current_index = -1
                     self.current_shuffled_index = -1
                     self.add_files_to_playlist(loaded_files)
@@ -984,18 +1752,28 @@ class MusicPlayer(QMainWindow):
 
         indices_to_remove = sorted([self.track_list.row(item) for item in selected_items], reverse=True)
 
-        current_playing_file = self.current_playback_file
-        stop_current_playback = False
-
-        for idx in indices_to_remove:
-            file_path = self.playlist[idx]
-            if file_path == current_playing_file:
-                stop_current_playback = True
+        removed_files = {self.playlist[idx] for idx in indices_to_remove}
+        stop_current_playback = self.current_playback_file in removed_files
 
-            self.track_list.takeItem(idx)
-            self.playlist.pop(idx)
-            if file_path in self.all_files: self.all_files.remove(file_path)
-            if file_path in self.shuffled_playlist: self.shuffled_playlist.remove(file_path)
+        # Quitar las filas con el repintado desactivado y filtrar las listas en una sola
+        # pasada, en lugar de un pop/remove lineal por canción eliminada.
+        self.track_list.setUpdatesEnabled(False)
+        try:
+            for idx in indices_to_remove:
+                self.track_list.takeItem(idx)
+        finally:
+            self.track_list.setUpdatesEnabled(True)
+        self.playlist[:] = [f for f in self.playlist if f not in removed_files]
+        self.all_files[:] = [f for f in self.all_files if f not in removed_files]
+        self.shuffled_playlist[:] = [f for f in self.shuffled_playlist if f not in removed_files]
+        self._rebuild_shuffled_index()
+        self._all_files_set.difference_update(removed_files)
+        self._rebuild_path_index()
+        for f in removed_files:
+            self._basename_cache.pop(f, None)
+            self._basename_lower_cache.pop(f, None)
+            self.meta_cache.pop(f, None)
+            self._search_strings.pop(f, None)
 
         if stop_current_playback:
             self.stop_playback(final_stop=True)
@@ -1005,58 +1783,77 @@ class MusicPlayer(QMainWindow):
             self.current_index = len(self.playlist) - 1
             if self.current_index == -1:
                 self.stop_playback(final_stop=True)
-                self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+                self._set_play_icon(False)
                 self.update_window_title()
-                self.album_art.clear()
-                self.album_art.setText("No Album Art")
+                self._clear_album_art()
                 self.lbl_title.setText("Title: -")
+                self._metadata_file = None
                 self.lbl_artist.setText("Artist: -")
                 self.lbl_album.setText("Album: -")
                 self.lbl_track.setText("Track: -")
                 self.slider.setRange(0, 0)
                 self.slider.setValue(0)
                 self.lbl_elapsed.setText("00:00")
+                self._last_elapsed_s = 0
                 self.lbl_duration.setText("00:00")
+                self._last_duration_ms = 0
                 self.update_playback_status_label("StoppedState")
-                self.visualizer_widget.update_visualization_data(np.array([]))
+                self.visualizer_widget.update_visualization_data(b"")
                 return
 
         if self._shuffle_mode:
             self.rebuild_shuffled_playlist()
-            if self.current_playback_file and self.current_playback_file in self.shuffled_playlist:
-                self.current_shuffled_index = self.shuffled_playlist.index(self.current_playback_file)
-            else:
-                self.current_shuffled_index = -1
+            self.current_shuffled_index = self._shuffled_pos.get(self.current_playback_file, -1)
 
         print("Pistas seleccionadas eliminadas.")
 
+    def _rebuild_path_index(self):
+        """Recalcula _path_to_index tras eliminar o reordenar canciones de la playlist."""
+        self._path_to_index = {f: i for i, f in enumerate(self.playlist)}
+
+    def _reindex_rows(self, first, last):
+        """Actualiza _path_to_index solo para las filas first..last, las únicas que se movieron."""
+        playlist = self.playlist
+        self._path_to_index.update((playlist[i], i) for i in range(first, last + 1))
+
     def clear_playlist(self):
         if not self.playlist:
             self._show_message_box("Info", "La playlist ya está vacía.")
             return
 
         self.stop_playback(final_stop=True)
+        self._cancel_scans()
         self.playlist.clear()
         self.shuffled_playlist.clear()
+        self._shuffled_pos.clear()
+        self._shuffle_dirty = True
         self.all_files.clear()
+        self._all_files_set.clear()
+        self._path_to_index.clear()
+        self._basename_cache.clear()
+        self._basename_lower_cache.clear()
+        self.meta_cache.clear()
+        self._search_strings.clear()
         self.track_list.clear()
         self.current_index = -1
         self.current_shuffled_index = -1
 
         self.lbl_title.setText("Title: -")
+        self._metadata_file = None
         self.lbl_artist.setText("Artist: -")
         self.lbl_album.setText("Álbum: -")
         self.lbl_track.setText("Pista: -")
-        self.album_art.clear()
-        self.album_art.setText("No Album Art")
+        self._clear_album_art()
         self.slider.setRange(0, 0)
         self.slider.setValue(0)
         self.lbl_elapsed.setText("00:00")
+        self._last_elapsed_s = 0
         self.lbl_duration.setText("00:00")
+        self._last_duration_ms = 0
 
         self.update_window_title()
         self.update_playback_status_label("StoppedState")
-        self.visualizer_widget.update_visualization_data(np.array([]))
+        self.visualizer_widget.update_visualization_data(b"")
 
         self._show_message_box("Info", "Playlist vaciada.")
 
@@ -1069,6 +1866,8 @@ class MusicPlayer(QMainWindow):
 
             track_to_move = self.playlist.pop(current_row)
             self.playlist.insert(current_row - 1, track_to_move)
+            self._path_to_index[track_to_move] = current_row - 1
+            self._path_to_index[self.playlist[current_row]] = current_row
 
             if self.current_index == current_row:
                 self.current_index -= 1
@@ -1077,8 +1876,8 @@ class MusicPlayer(QMainWindow):
 
             if self._shuffle_mode:
                 self.rebuild_shuffled_playlist()
-                if self.current_playback_file in self.shuffled_playlist:
-                    self.current_shuffled_index = self.shuffled_playlist.index(self.current_playback_file)
+                if self.current_playback_file in self._shuffled_pos:
+                    self.current_shuffled_index = self._shuffled_pos[self.current_playback_file]
 
     def move_track_down(self):
         current_row = self.track_list.currentRow()
@@ -1089,6 +1888,8 @@ class MusicPlayer(QMainWindow):
 
             track_to_move = self.playlist.pop(current_row)
             self.playlist.insert(current_row + 1, track_to_move)
+            self._path_to_index[track_to_move] = current_row + 1
+            self._path_to_index[self.playlist[current_row]] = current_row
 
             if self.current_index == current_row:
                 self.current_index += 1
@@ -1097,8 +1898,8 @@ class MusicPlayer(QMainWindow):
 
             if self._shuffle_mode:
                 self.rebuild_shuffled_playlist()
-                if self.current_playback_file in self.shuffled_playlist:
-                    self.current_shuffled_index = self.shuffled_playlist.index(self.current_playback_file)
+                if self.current_playback_file in self._shuffled_pos:
+                    self.current_shuffled_index = self._shuffled_pos[self.current_playback_file]
 
     def _handle_playlist_rows_moved(self, parent, start, end, destination, row):
         old_index = start
@@ -1115,76 +1916,37 @@ class MusicPlayer(QMainWindow):
         else:
             self.playlist.insert(new_index, moved_file)
             new_index_for_logic = new_index
+        # Mover una fila solo desplaza las que hay entre su posición vieja y la nueva
+        self._reindex_rows(min(old_index, new_index_for_logic), max(old_index, new_index_for_logic))
 
         print(f"DEBUG: Playlist reordenada: {os.path.basename(moved_file)} movido de {old_index} a {new_index_for_logic}.")
 
         if self.current_playback_file:
             try:
-                new_current_index = self.playlist.index(self.current_playback_file)
+                new_current_index = self._path_to_index[self.current_playback_file]
                 if new_current_index != self.current_index:
                     self.current_index = new_current_index
                     self.track_list.setCurrentRow(self.current_index)
                     print(f"DEBUG: current_index actualizado a {self.current_index}")
-            except ValueError:
+            except KeyError:
                 print("Advertencia: Canción actual no encontrada en la playlist después del reordenamiento (esto no debería ocurrir).")
 
         if self._shuffle_mode:
             self.rebuild_shuffled_playlist()
-            if self.current_playback_file and self.current_playback_file in self.shuffled_playlist:
-                self.current_shuffled_index = self.shuffled_playlist.index(self.current_playback_file)
-            else:
-                self.current_shuffled_index = -1
+            self.current_shuffled_index = self._shuffled_pos.get(self.current_playback_file, -1)
 
     def _find_optimal_device_samplerate(self, file_samplerate, device_index, num_channels):
         if sd is None:
             return file_samplerate
 
         try:
-            device_info = sd.query_devices(device_index)
-
-            prioritized_samplerates = [file_samplerate, 48000, 44100, 96000, 88200]
-            seen_sr = set()
-            unique_prioritized_samplerates = []
-            for sr in prioritized_samplerates:
-                if sr not in seen_sr:
-                    unique_prioritized_samplerates.append(sr)
-                    seen_sr.add(sr)
-
-            for sr in unique_prioritized_samplerates:
-                try:
-                    sd.check_output_settings(
-                        device=device_index,
-                        samplerate=sr,
-                        channels=num_channels,
-                        dtype='float32'
-                    )
-                    print(f"DEBUG: Dispositivo {device_index} soporta samplerate: {sr} Hz (para {num_channels} canales).")
-                    return sr
-                except sd.PortAudioError:
-                    pass
-
-            default_sr = int(device_info['default_samplerate'])
-            try:
-                sd.check_output_settings(
-                    device=device_index,
-                    samplerate=default_sr,
-                    channels=num_channels,
-                    dtype='float32'
-                )
-                print(f"DEBUG: Dispositivo {device_index} soporta su samplerate por defecto: {default_sr} Hz.")
-                return default_sr
-            except sd.PortAudioError:
-                pass
-
-            print(f"ADVERTENCIA: No se encontró una frecuencia de muestreo compatible para el dispositivo {device_index} y {num_channels} canales. Usando la del archivo {file_samplerate}.")
-            return file_samplerate
-
+            return _probe_output_samplerate(device_index, num_channels, file_samplerate)
         except Exception as e:
             print(f"ERROR: No se pudo consultar las capacidades del dispositivo {device_index}: {e}")
             return file_samplerate
 
 
-    def load_and_play(self, file_path, start_position_ms=0, stop_current_playback=True, auto_start_playback=False):
+    def load_and_play(self, file_path, start_position_ms=0, stop_current_playback=True, auto_start_playback=False, index=None):
         if sf is None or sd is None or resample is None:
             print("ERROR: load_and_play: Las librerías DSP (SoundFile, SoundDevice, SciPy) no están cargadas. El reproductor no puede funcionar.")
             self.update_playback_status_label("StoppedState")
@@ -1199,44 +1961,41 @@ class MusicPlayer(QMainWindow):
             self.stop_playback(final_stop=False)
 
         try:
-            self.current_playback_file = file_path
-
-            data_from_file, file_samplerate = sf.read(file_path, dtype='float32')
-
-            if data_from_file.ndim == 1:
-                self.current_audio_data_original = np.stack([data_from_file, data_from_file], axis=-1)
-                self.audio_channels_original = 2
+            if file_path == self.current_playback_file and self._stream_file is not None:
+                # Seek, reanudar o repetir la misma canción: ya se conoce su formato
+                print("DEBUG: load_and_play: Reutilizando la información del archivo abierto.")
             else:
-                self.current_audio_data_original = data_from_file
-                self.audio_channels_original = self.current_audio_data_original.shape[1]
-
-            self._file_samplerate = file_samplerate
+                # Solo se lee la cabecera; las muestras las lee por bloques el hilo de reproducción
+                with sf.SoundFile(file_path) as audio_file:
+                    file_samplerate = audio_file.samplerate
+                    self._file_channels = audio_file.channels
+                    self._file_frames = audio_file.frames
+                self._stream_file = file_path
+                # Los archivos mono se reproducen duplicados en dos canales
+                self.audio_channels_original = 2 if self._file_channels == 1 else self._file_channels
+                self._file_samplerate = file_samplerate
+            self.current_playback_file = file_path
 
             self.audio_samplerate_output = self._find_optimal_device_samplerate(
                 self._file_samplerate, self.selected_output_device_index, self.audio_channels_original
             )
 
             self.audio_samplerate = self._file_samplerate
-            self.total_frames = len(self.current_audio_data_original)
+            self.total_frames = self._file_frames
 
             self.current_frame = int((start_position_ms / 1000.0) * self._file_samplerate)
             self.current_frame = max(0, min(self.current_frame, self.total_frames))
             print(f"DEBUG: load_and_play: current_frame after setting based on start_position_ms: {self.current_frame}")
 
-            if self.audio_channels_original > 0:
-                self.equalizer_filters = [self._design_band_filter(freq, gain)
-                                          for freq, gain in zip(self._get_band_frequencies(), self.equalizer_settings)]
-                self.filter_states = [np.zeros((max(len(b), len(a)) - 1, self.audio_channels_original))
-                                      for b, a in self.equalizer_filters]
-            else:
-                self.filter_states = []
+            self._set_eq_filters(self.equalizer_settings)
             print("DEBUG: load_and_play: Estados de filtro reseteados.")
 
-            try:
-                self.current_index = self.playlist.index(file_path)
-                self.track_list.setCurrentRow(self.current_index)
-            except ValueError:
-                self.current_index = -1
+            # Quien ya conoce la fila (siguiente/anterior, selección) la pasa en index
+            if index is None:
+                index = self._path_to_index.get(file_path, -1)
+            self.current_index = index
+            if index != -1:
+                self.track_list.setCurrentRow(index)
             self.update_metadata(file_path)
             self.update_position_ui(start_position_ms)
 
@@ -1253,7 +2012,7 @@ class MusicPlayer(QMainWindow):
                 self.audio_playback_thread.start()
                 self.is_playing = True
                 self.ui_update_timer.start()
-                self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPause))
+                self._set_play_icon(True)
                 self.update_playback_status_label("PlayingState")
             else:
                 print("DEBUG: load_and_play: Canción cargada y preparada, pero no auto-reproducida.")
@@ -1261,7 +2020,7 @@ class MusicPlayer(QMainWindow):
                     self.stop_playback(final_stop=False) # Ensure previous thread is stopped
                 self.is_playing = False
                 self.pause_playback_event.set() # Ensure paused state is set
-                self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+                self._set_play_icon(False)
                 self.update_playback_status_label("StoppedState")
 
             print(f"DEBUG: load_and_play: Preparada: {os.path.basename(file_path)}")
@@ -1275,13 +2034,150 @@ class MusicPlayer(QMainWindow):
             self.update_playback_status_label("StoppedState")
 
 
+    def _render_audio_blocks(self, ring, start_frame, initial_position_ms, output_samplerate,
+                             output_channels, blocksize_output, stop_event, errors):
+        """
+        Productor de _audio_playback_thread_main, en su propio hilo: lee los bloques del archivo,
+        aplica el ecualizador, remuestrea y aplica el fade-in inicial, y deja cada bloque en ring
+        junto con la posición del archivo tras él. Al llegar al final marca ring.finished; si
+        falla, deja la excepción en errors para que el hilo de escritura la relance.
+
+        El archivo no se carga entero en memoria: se abre aquí con su propio SoundFile (que no
+        se comparte entre hilos) y se lee bloque a bloque en un buffer reservado una vez. Un
+        seek reinicia este hilo, que abre el archivo y salta directamente a start_frame.
+        """
+        try:
+            audio_file = sf.SoundFile(self._stream_file)
+        except Exception as e:
+            errors.append(e)
+            ring.finished = True
+            return
+
+        try:
+            if start_frame > 0:
+                audio_file.seek(start_frame)
+            current_frame_pos = start_frame
+            is_initial_fade_in = (initial_position_ms == 0)
+            fade_in_duration_frames_original = int(self.crossfade_duration_seconds * self._file_samplerate)
+
+            # Ecualizador y remuestreo trabajan con los canales del archivo; un archivo mono se
+            # procesa en una sola columna y se duplica al copiarlo al slot de dos canales
+            file_channels = audio_file.channels
+
+            # Sin Numba se mantiene el remuestreo por FFT de scipy para cada bloque
+            resampler = None
+            if NUMBA_AVAILABLE and output_samplerate > 0 and self._file_samplerate != output_samplerate:
+                resampler = BlockResampler(self._file_samplerate, output_samplerate, file_channels)
+
+            input_frames_to_read_original = int(np.ceil(blocksize_output * (self._file_samplerate / output_samplerate)))
+            if input_frames_to_read_original == 0: input_frames_to_read_original = 1
+            read_buffer = np.empty((input_frames_to_read_original, file_channels), dtype=np.float32)
+            # Bloque con la ganancia y el ecualizador aplicados, reservado una vez como read_buffer
+            eq_buffer = np.empty((input_frames_to_read_original, file_channels), dtype=np.float32)
+            # Salida del remuestreo cuando no puede escribirse directamente en el slot (archivo mono)
+            resampled_buffer = None
+            if file_channels != output_channels:
+                resampled_buffer = np.empty((blocksize_output, file_channels), dtype=np.float32)
+
+            while not stop_event.is_set():
+                slot = ring.free_slot()
+                if slot is None:
+                    stop_event.wait(_AUDIO_RING_POLL_S) # Cola llena: el hilo de escritura va por detrás
+                    continue
+
+                frames_available_original = self.total_frames - current_frame_pos
+                actual_input_frames_read = min(input_frames_to_read_original, frames_available_original)
+
+                if actual_input_frames_read <= 0:
+                    print("DEBUG: _render_audio_blocks: No más frames para leer de archivo original. Fin de la canción.")
+                    break
+
+                input_block_original = audio_file.read(dtype='float32', always_2d=True,
+                                                       out=read_buffer[:actual_input_frames_read])
+                actual_input_frames_read = len(input_block_original)
+                if actual_input_frames_read == 0:
+                    print("DEBUG: _render_audio_blocks: El archivo terminó antes de lo indicado en su cabecera.")
+                    break
+
+                # out float32: el bloque sigue en float32 (la mitad de memoria que float64 y lo que
+                # esperan los kernels) aunque la ganancia llegue como escalar float64 de NumPy
+                processed_block = eq_buffer[:actual_input_frames_read]
+                np.multiply(input_block_original, self.eq_master_gain_factor, out=processed_block)
+
+                eq_sos = self._eq_sos
+                eq_states = self.filter_states
+                if eq_sos is not None and isinstance(eq_states, np.ndarray) \
+                        and eq_states.shape == (len(eq_sos), 2, processed_block.shape[1]):
+                    # Las diez bandas y todos los canales en una sola pasada. Los estados se
+                    # actualizan en el sitio; si la UI rediseña el ecualizador reemplaza el
+                    # array y el siguiente bloque ya usa el nuevo.
+                    if NUMBA_AVAILABLE:
+                        sos_cascade(eq_sos, eq_states, processed_block)
+                    else:
+                        # sosfilt recorre la cascada en un solo bucle en C, sin un lfilter
+                        # por banda y canal desde Python
+                        filtered_block, eq_states[...] = sosfilt(eq_sos, processed_block,
+                                                                 axis=0, zi=eq_states)
+                        processed_block[...] = filtered_block # De vuelta a float32 en eq_buffer
+
+                # El bloque de salida se escribe en su slot de la cola; las asignaciones difunden
+                # una columna mono (n, 1) a los dos canales del slot
+                output_block = ring.blocks[slot]
+                if self._file_samplerate != output_samplerate and resampler is not None:
+                    if resampled_buffer is None:
+                        resampler.process(processed_block, input_frames_to_read_original / blocksize_output,
+                                          output_block)
+                    else:
+                        resampler.process(processed_block, input_frames_to_read_original / blocksize_output,
+                                          resampled_buffer)
+                        output_block[:] = resampled_buffer
+                elif self._file_samplerate != output_samplerate and resample is not None:
+                    output_block[:] = resample(processed_block, num=blocksize_output, axis=0)
+                else:
+                    if self._file_samplerate != output_samplerate:
+                        print("ADVERTENCIA: resample no disponible, no se pudo remuestrear el bloque de audio. Salida sin remuestreo.")
+                    n_copy = min(len(processed_block), blocksize_output)
+                    output_block[:n_copy] = processed_block[:n_copy]
+                    output_block[n_copy:] = 0.0
+
+                if is_initial_fade_in and current_frame_pos < fade_in_duration_frames_original:
+                    segment_fade_factors_original = np.linspace(
+                        (current_frame_pos / fade_in_duration_frames_original),
+                        ((current_frame_pos + actual_input_frames_read) / fade_in_duration_frames_original),
+                        actual_input_frames_read,
+                        dtype='float32'
+                    )
+                    if len(segment_fade_factors_original) == blocksize_output:
+                        resampled_fade_factors = segment_fade_factors_original
+                    else:
+                        # La rampa es lineal: basta con muestrearla directamente en blocksize_output puntos
+                        resampled_fade_factors = np.linspace(segment_fade_factors_original[0],
+                                                             segment_fade_factors_original[-1],
+                                                             blocksize_output, dtype='float32')
+
+                    resampled_fade_factors = np.clip(resampled_fade_factors, 0, 1)
+                    output_block *= resampled_fade_factors[:, np.newaxis]
+
+                elif is_initial_fade_in and current_frame_pos >= fade_in_duration_frames_original:
+                    is_initial_fade_in = False
+                    print("DEBUG: Fade-in completado.")
+
+                current_frame_pos += actual_input_frames_read
+                ring.frame_pos[slot] = current_frame_pos
+                ring.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            audio_file.close()
+            ring.finished = True
+
     def _audio_playback_thread_main(self, initial_position_ms, output_samplerate, output_channels):
         critical_audio_thread_error_for_ui = False
         error_title = ""
         error_message = ""
 
-        if sd is None or self.current_audio_data_original is None:
-            print("ERROR: _audio_playback_thread_main: sd o current_audio_data_original es None al iniciar el hilo.")
+        if sd is None or self._stream_file is None:
+            print("ERROR: _audio_playback_thread_main: sd o _stream_file es None al iniciar el hilo.")
             self.playback_finished_event.set()
             return
         
@@ -1289,6 +2185,9 @@ class MusicPlayer(QMainWindow):
 
         blocksize_output = 1024
         stream = None
+        render_thread = None
+        render_stop = threading.Event()
+        render_errors = []
 
         try:
             current_default_device_id = self.selected_output_device_index
@@ -1360,8 +2259,24 @@ class MusicPlayer(QMainWindow):
             if self.total_frames < blocksize_output * 20:
                 print_interval = 1
 
-            is_initial_fade_in = (initial_position_ms == 0)
-            fade_in_duration_frames_original = int(self.crossfade_duration_seconds * self._file_samplerate)
+            # Bandas del visualizador para esta frecuencia de salida, calculadas una vez por hilo
+            spectrum_window = None
+            if output_samplerate > 0:
+                bar_edges = _spectrum_bar_edges(output_samplerate)
+                bar_widths = np.diff(bar_edges)
+                bar_power = np.empty(_SPECTRUM_BARS, dtype=np.float32)
+                bar_levels = np.empty(_SPECTRUM_BARS, dtype=np.float32)
+
+            # Los bloques se leen, ecualizan y remuestrean en un hilo productor que los deja en
+            # la cola circular; este hilo solo aplica volumen, actualiza el espectro y escribe
+            ring = AudioBlockRing(_AUDIO_RING_BLOCKS, blocksize_output, output_channels)
+            render_thread = threading.Thread(
+                target=self._render_audio_blocks,
+                args=(ring, current_frame_pos, initial_position_ms, output_samplerate, output_channels,
+                      blocksize_output, render_stop, render_errors),
+                daemon=True
+            )
+            render_thread.start()
 
             while not self.stop_playback_event.is_set():
                 while self.pause_playback_event.is_set():
@@ -1381,114 +2296,46 @@ class MusicPlayer(QMainWindow):
                     self.pause_playback_event.set() # Ensure playback is paused
                     return # Exit the thread immediately and gracefully
 
-                if current_frame_pos >= self.total_frames:
-                    print("DEBUG: _audio_playback_thread_main: Fin de la canción (current_frame_pos >= total_frames). Señalando finalización.")
-                    self.playback_finished_event.set()
-                    break
-
-                input_frames_to_read_original = int(np.ceil(blocksize_output * (self._file_samplerate / output_samplerate)))
-                if input_frames_to_read_original == 0: input_frames_to_read_original = 1
-
-                frames_available_original = self.total_frames - current_frame_pos
-                actual_input_frames_read = min(input_frames_to_read_original, frames_available_original)
-
-                if actual_input_frames_read <= 0:
-                    print("DEBUG: _audio_playback_thread_main: No más frames para leer de archivo original. Fin de la canción.")
-                    self.playback_finished_event.set()
-                    break
-
-                input_block_original = self.current_audio_data_original[current_frame_pos : current_frame_pos + actual_input_frames_read]
-
-                processed_block = input_block_original * self.eq_master_gain_factor
-
-                current_filter_states = [arr.copy() for arr in self.filter_states]
-                current_equalizer_filters = list(self.equalizer_filters)
-
-                for i, (b, a) in enumerate(current_equalizer_filters):
-                    if not (len(b) == 1 and np.isclose(b[0], 1.0) and len(a) == 1 and np.isclose(a[0], 1.0)):
-                        for channel_idx in range(self.audio_channels_original):
-                            if current_filter_states[i].shape[0] > 0:
-                                zi_channel = current_filter_states[i][:, channel_idx]
-                            else:
-                                zi_channel = None
-
-                            processed_block[:, channel_idx], updated_zi = \
-                                lfilter(b, a, processed_block[:, channel_idx], zi=zi_channel)
-
-                            if updated_zi is not None:
-                                current_filter_states[i][:, channel_idx] = updated_zi
-
-                self.filter_states = current_filter_states
+                # finished se lee antes que la cola: si ya estaba activo y no queda nada, no queda nada
+                render_finished = ring.finished
+                slot = ring.ready_slot()
+                if slot is None:
+                    if render_errors:
+                        raise render_errors[0]
+                    if render_finished:
+                        print("DEBUG: _audio_playback_thread_main: Fin de la canción (current_frame_pos >= total_frames). Señalando finalización.")
+                        self.playback_finished_event.set()
+                        break
+                    time.sleep(_AUDIO_RING_POLL_S) # El productor aún no ha dejado el siguiente bloque
+                    continue
 
-                if self._file_samplerate != output_samplerate:
-                    if resample is None:
-                        output_block = processed_block
-                        print("ADVERTENCIA: resample no disponible, no se pudo remuestrear el bloque de audio. Salida sin remuestreo.")
-                    else:
-                        if processed_block.ndim == 1:
-                            resampled_data_block = resample(processed_block, num=blocksize_output)
-                            if output_channels == 2:
-                                resampled_data_block = np.stack([resampled_data_block, resampled_data_block], axis=-1)
-                        else:
-                            resampled_data_block = np.zeros((blocksize_output, output_channels), dtype='float32')
-                            for i in range(output_channels):
-                                resampled_data_block[:, i] = resample(processed_block[:, i], num=blocksize_output)
-                        output_block = resampled_data_block
+                # El slot es de este hilo hasta release(), así que se modifica en el sitio
+                output_block = ring.blocks[slot]
+                if NUMBA_AVAILABLE:
+                    scale_inplace(output_block, self._volume_linear)
                 else:
-                    output_block = processed_block
-                    if len(output_block) < blocksize_output:
-                        padding = np.zeros((blocksize_output - len(output_block), output_channels), dtype='float32')
-                        output_block = np.vstack((output_block, padding))
-                    elif len(output_block) > blocksize_output:
-                        output_block = output_block[:blocksize_output]
-
-                current_volume_linear = self.settings.value("last_volume", 50, type=int) / 100.0
-                output_block = output_block * current_volume_linear
-
-                if is_initial_fade_in and current_frame_pos < fade_in_duration_frames_original:
-                    segment_fade_factors_original = np.linspace(
-                        (current_frame_pos / fade_in_duration_frames_original),
-                        ((current_frame_pos + actual_input_frames_read) / fade_in_duration_frames_original),
-                        actual_input_frames_read,
-                        dtype='float32'
-                    )
-                    if resample is None:
-                        resampled_fade_factors = segment_fade_factors_original
-                    else:
-                        resampled_fade_factors = resample(segment_fade_factors_original, num=blocksize_output)
-
-                    resampled_fade_factors = np.clip(resampled_fade_factors, 0, 1)
-
-                    if output_block.ndim > 1:
-                        output_block[:, :] *= resampled_fade_factors[:, np.newaxis]
-                    else:
-                        output_block[:] *= resampled_fade_factors
-
-                elif is_initial_fade_in and current_frame_pos >= fade_in_duration_frames_original:
-                    is_initial_fade_in = False
-                    print("DEBUG: Fade-in completado.")
-
-                output_block = np.clip(output_block, -1.0, 1.0)
+                    output_block *= self._volume_linear
+                np.clip(output_block, -1.0, 1.0, out=output_block)
 
-                if fft is not None and output_samplerate > 0:
+                if output_samplerate > 0:
                     mono_block = output_block[:, 0] if output_block.ndim > 1 else output_block
-                    N = len(mono_block)
-
-                    window = np.hanning(N)
-                    windowed_block = mono_block * window
-
-                    yf = fft(windowed_block)
-
-                    magnitudes = np.abs(yf[0:N//2])
-
-                    magnitudes_log = 20 * np.log10(magnitudes + 1e-9)
-
-                    min_db = -80
-                    max_db = 0
-                    normalized_magnitudes = np.clip((magnitudes_log - min_db) / (max_db - min_db), 0, 1)
-                    normalized_magnitudes = np.nan_to_num(normalized_magnitudes, nan=0.0, posinf=0.0, neginf=0.0)
-
-                    self.update_visualizer_signal.emit(normalized_magnitudes)
+                    if spectrum_window is None or len(spectrum_window) != len(mono_block):
+                        spectrum_window = np.hanning(len(mono_block)).astype(np.float32)
+
+                    spectrum = rfft(mono_block * spectrum_window, n=_SPECTRUM_FFT_SIZE)
+                    power = spectrum.real ** 2 + spectrum.imag ** 2
+
+                    # Potencia media de los bins de cada barra, en una sola operación vectorizada
+                    np.add.reduceat(power[:bar_edges[-1]], bar_edges[:-1], out=bar_power)
+                    bar_power /= bar_widths
+                    bars_db = 10.0 * np.log10(bar_power + 1e-18)
+                    levels = (bars_db - _SPECTRUM_MIN_DB) * (255.0 / (_SPECTRUM_MAX_DB - _SPECTRUM_MIN_DB))
+                    np.clip(levels, 0, 255, out=levels)
+                    sanitize_finite(bar_levels, levels) # NaN e infinitos a 0 antes de pasar a entero
+
+                    # Cada barra viaja como un byte: la señal lleva un bytes inmutable de 50 bytes
+                    # en lugar de un ndarray que la UI podría leer mientras este hilo lo reutiliza
+                    self.update_visualizer_signal.emit(bar_levels.astype(np.uint8).tobytes())
                 try:
                     stream.write(output_block)
                 except sd.PortAudioError as pa_err_inner:
@@ -1532,12 +2379,13 @@ class MusicPlayer(QMainWindow):
                             return
 
 
-                current_frame_pos += actual_input_frames_read
+                current_frame_pos = int(ring.frame_pos[slot])
+                ring.release()
                 self.current_frame = current_frame_pos
 
                 print_counter += 1
                 if print_counter % print_interval == 0 or current_frame_pos >= self.total_frames:
-                    print(f"DEBUG: _audio_playback_thread_main: Escribiendo frames. Pos: {self.current_frame}/{self.total_frames} (original). Vol: {self.vol_slider.value()}%")
+                    print(f"DEBUG: _audio_playback_thread_main: Escribiendo frames. Pos: {self.current_frame}/{self.total_frames} (original). Vol: {self._volume_linear * 100:.0f}%")
 
             if stream and stream.active:
                 stream.stop()
@@ -1574,6 +2422,9 @@ class MusicPlayer(QMainWindow):
             self.playback_finished_event.set()
         finally:
             print("DEBUG: _audio_playback_thread_main: Hilo de reproducción de audio finalizado (finally block).")
+            render_stop.set()
+            if render_thread is not None:
+                render_thread.join()
             # Only close stream if it was opened locally in this thread and is still active
             if stream and stream.active: 
                 try:
@@ -1595,7 +2446,7 @@ class MusicPlayer(QMainWindow):
         """Slot para mostrar mensajes de error de audio de forma segura en el hilo de UI y actualizar estado."""
         print(f"DEBUG: _handle_audio_error_in_ui: Recibido error: {title} - {message}")
         self.update_playback_status_label("PausedState")
-        self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+        self._set_play_icon(False)
         self._show_message_box(title, message)
 
     def _delayed_restart_playback(self, start_position_ms):
@@ -1613,6 +2464,8 @@ class MusicPlayer(QMainWindow):
         Este slot corre en el hilo principal (UI).
         """
         print(f"DEBUG: _on_system_audio_device_changed: Notificación de cambio de dispositivo del sistema recibida. Nuevo ID: {new_device_id_str}")
+        # Los índices de PortAudio pueden pasar a otro dispositivo: volver a consultar las frecuencias
+        _probe_output_samplerate.cache_clear()
         self.update_default_audio_device_display()
 
 
@@ -1662,12 +2515,12 @@ class MusicPlayer(QMainWindow):
             self.current_frame = 0
             self.total_frames = 0
             self.current_playback_file = None
-            self.current_audio_data_original = None
-            self.visualizer_widget.update_visualization_data(np.array([]))
+            self._stream_file = None
+            self.visualizer_widget.update_visualization_data(b"")
             self.update_position_ui(0)
             self.update_duration_ui(0)
             self.update_playback_status_label("StoppedState")
-            self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+            self._set_play_icon(False)
 
         print("DEBUG: Reproducción detenida y hilos terminados (fin de stop_playback).")
 
@@ -1688,7 +2541,7 @@ class MusicPlayer(QMainWindow):
         elif self.is_playing:
             self.pause_playback_event.set()
             self.is_playing = False
-            self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+            self._set_play_icon(False)
             self.update_playback_status_label("PausedState")
             print("DEBUG: Pausado.")
         else:
@@ -1706,20 +2559,38 @@ class MusicPlayer(QMainWindow):
                     return
             print("DEBUG: Reanudado (vía toggle_play).")
 
+    def _advance(self, delta, wrap=True):
+        """
+        Reproduce la canción que está delta posiciones más allá en la lista activa: la aleatoria
+        si el modo aleatorio está activo, o la playlist si no. Con wrap=False no da la vuelta al
+        llegar a un extremo y devuelve False si no hay canción en esa posición.
+        """
+        shuffled = self._shuffle_mode and bool(self.shuffled_playlist)
+        active_list = self.shuffled_playlist if shuffled else self.playlist
+        if not active_list:
+            return False
+
+        position = (self.current_shuffled_index if shuffled else self.current_index) + delta
+        if wrap:
+            position %= len(active_list)
+        elif not 0 <= position < len(active_list):
+            print("DEBUG: _advance: Fin de la playlist.")
+            return False
+
+        next_file = active_list[position]
+        if shuffled:
+            self.current_shuffled_index = position
+            index = self._path_to_index[next_file]
+        else:
+            self.current_index = position
+            index = position
+        self.load_and_play(next_file, auto_start_playback=True, index=index)
+        return True
+
     def prev_track(self):
         if not self.playlist: return
         self.stop_playback(final_stop=False)
-
-        if self._shuffle_mode and self.shuffled_playlist:
-            self.current_shuffled_index = (self.current_shuffled_index - 1) % len(self.shuffled_playlist)
-            next_file = self.shuffled_playlist[self.current_shuffled_index]
-            self.load_and_play(next_file, auto_start_playback=True)
-            self.current_index = self.playlist.index(next_file)
-            self.track_list.setCurrentRow(self.current_index)
-        else:
-            self.current_index = (self.current_index - 1 + len(self.playlist)) % len(self.playlist)
-            self.load_and_play(self.playlist[self.current_index], auto_start_playback=True)
-            self.track_list.setCurrentRow(self.current_index)
+        self._advance(-1)
 
     def next_track(self):
         if not self.playlist: return
@@ -1729,48 +2600,54 @@ class MusicPlayer(QMainWindow):
             self.load_and_play(self.current_playback_file or self.playlist[self.current_index], auto_start_playback=True)
             return
 
-        if self._shuffle_mode and self.shuffled_playlist:
-            self.current_shuffled_index = (self.current_shuffled_index + 1) % len(self.shuffled_playlist)
-            next_file = self.shuffled_playlist[self.current_shuffled_index]
-            self.load_and_play(next_file, auto_start_playback=True)
-            self.current_index = self.playlist.index(next_file)
-            self.track_list.setCurrentRow(self.current_index)
-        else:
-            self.current_index = (self.current_index + 1) % len(self.playlist)
-            self.load_and_play(self.playlist[self.current_index], auto_start_playback=True)
-            self.track_list.setCurrentRow(self.current_index)
+        self._advance(1)
 
     def toggle_shuffle_mode(self):
         self._shuffle_mode = not self._shuffle_mode
         self.btn_shuffle.setChecked(self._shuffle_mode)
         if self._shuffle_mode:
-            self.rebuild_shuffled_playlist()
+            if self._shuffle_dirty:
+                self.rebuild_shuffled_playlist()
+            elif self.current_playback_file in self._all_files_set:
+                # La playlist no cambió: se reutiliza el orden aleatorio anterior
+                self.current_shuffled_index = self._shuffled_pos[self.current_playback_file]
             self._show_message_box("Modo Aleatorio", "Reproducción aleatoria activada.")
         else:
-            if self.current_playback_file and self.current_playback_file in self.playlist:
-                self.current_index = self.playlist.index(self.current_playback_file)
+            if self.current_playback_file and self.current_playback_file in self._all_files_set:
+                self.current_index = self._path_to_index[self.current_playback_file]
                 self.track_list.setCurrentRow(self.current_index)
             self._show_message_box("Modo Aleatorio", "Reproducción aleatoria desactivada.")
 
     def rebuild_shuffled_playlist(self):
         if not self.playlist:
             self.shuffled_playlist = []
+            self._shuffled_pos = {}
             return
 
         current_song = self.current_playback_file
         temp_playlist = list(self.playlist)
 
-        if current_song and current_song in temp_playlist:
-            temp_playlist.remove(current_song)
+        if current_song and current_song in self._all_files_set:
+            # Se baraja después, así que basta con mover la última al hueco de la actual
+            # en lugar del remove() lineal
+            current_pos = self._path_to_index[current_song]
+            temp_playlist[current_pos] = temp_playlist[-1]
+            temp_playlist.pop()
             random.shuffle(temp_playlist)
             self.shuffled_playlist = [current_song] + temp_playlist
             self.current_shuffled_index = 0
         else:
             random.shuffle(temp_playlist)
             self.shuffled_playlist = temp_playlist
-            self.current_shuffled_index = self.playlist.index(self.current_playback_file) if self.current_playback_file in self.playlist else 0
+            self.current_shuffled_index = self._path_to_index.get(self.current_playback_file, 0)
+        self._rebuild_shuffled_index()
+        self._shuffle_dirty = False
         print("DEBUG: Playlist aleatoria reconstruida.")
 
+    def _rebuild_shuffled_index(self):
+        """Recalcula _shuffled_pos tras cambiar el orden o el contenido de shuffled_playlist."""
+        self._shuffled_pos = {f: i for i, f in enumerate(self.shuffled_playlist)}
+
     def toggle_repeat_mode(self):
         self._repeat_mode = (self._repeat_mode + 1) % 3
         if self._repeat_mode == self.NO_REPEAT:
@@ -1789,55 +2666,84 @@ class MusicPlayer(QMainWindow):
             index = self.track_list.row(selected_items[0])
             if 0 <= index < len(self.playlist):
                 selected_file_path = self.playlist[index]
-                self.current_index = index
-                self.load_and_play(selected_file_path, auto_start_playback=True)
+                self.load_and_play(selected_file_path, auto_start_playback=True, index=index)
             else:
                 self._show_message_box("Error", "La selección no es válida. Por favor, selecciona una canción de la lista.")
         else:
             self._show_message_box("Info", "Ninguna canción seleccionada para reproducir.")
 
-    def filter_track_list(self, text):
+    def _on_search_text_changed(self, text):
         if not text:
-            for i in range(self.track_list.count()):
-                self.track_list.item(i).setHidden(False)
+            # Borrar la búsqueda muestra la lista completa al instante
+            self._filter_timer.stop()
+            self.filter_track_list(text)
         else:
-            for i in range(self.track_list.count()):
-                item = self.track_list.item(i)
-                file_path = self.playlist[i]
+            self._filter_timer.start() # Reinicia la cuenta atrás con cada tecla
 
-                title = os.path.splitext(os.path.basename(file_path))[0]
-                artist = ''
-                album = ''
-                try:
-                    audio = None
-                    if file_path.lower().endswith('.mp3'): audio = MP3(file_path)
-                    elif file_path.lower().endswith('.flac'): audio = FLAC(file_path)
-                    elif file_path.lower().endswith(('.ogg', '.oga')): audio = OggVorbis(file_path)
-
-                    if audio and audio.tags:
-                        if 'title' in audio.tags and isinstance(audio.tags['title'], list):
-                            title = str(audio.tags['title'][0])
-                        elif 'TIT2' in audio.tags:
-                            title = str(audio.tags['TIT2'])
-
-                        if 'artist' in audio.tags and isinstance(audio.tags['artist'], list):
-                            artist = str(audio.tags['artist'][0])
-                        elif 'TPE1' in audio.tags:
-                            artist = str(audio.tags['TPE1'])
-
-                        if 'album' in audio.tags and isinstance(audio.tags['album'], list):
-                            album = str(audio.tags['album'][0])
-                        elif 'TALB' in audio.tags:
-                            album = str(audio.tags['TALB'])
+    def _apply_search_filter(self):
+        self.filter_track_list(self.search_input.text())
 
-                except Exception:
-                    pass
+    def filter_track_list(self, text):
+        # Un solo repintado al terminar, en lugar de uno por fila mostrada u ocultada
+        self.track_list.setUpdatesEnabled(False)
+        try:
+            # Las filas nunca se recrean: solo cambia su visibilidad. La fila i es playlist[i].
+            set_row_hidden = self.track_list.setRowHidden
+            if not text:
+                for i in range(len(self.playlist)):
+                    set_row_hidden(i, False)
+            else:
+                needle = text.lower()
+                search_strings = self._search_strings
+                basenames_lower = self._basename_lower_cache
+                for i, file_path in enumerate(self.playlist):
+                    # Nunca se lee del disco al teclear: mientras las etiquetas no lleguen de la
+                    # biblioteca o de TagPrefetchWorker se busca solo en el nombre del archivo,
+                    # y _store_search_tags vuelve a filtrar esas filas cuando llegan
+                    search_string = search_strings.get(file_path)
+                    if search_string is None:
+                        search_string = basenames_lower[file_path]
+                    set_row_hidden(i, needle not in search_string)
+        finally:
+            self.track_list.setUpdatesEnabled(True)
 
-                search_string = f"{title} {artist} {album} {os.path.basename(file_path)}".lower()
-                if text.lower() in search_string:
-                    item.setHidden(False)
-                else:
-                    item.setHidden(True)
+    def _refilter_rows(self, file_paths):
+        # Con una búsqueda activa, las filas de file_paths se filtraron solo por su nombre;
+        # ahora que tienen etiquetas se vuelven a comprobar sin recorrer toda la playlist
+        text = self.search_input.text()
+        if not text:
+            return
+        needle = text.lower()
+        search_strings = self._search_strings
+        path_to_index = self._path_to_index
+        set_row_hidden = self.track_list.setRowHidden
+        for file_path in file_paths:
+            row = path_to_index.get(file_path)
+            search_string = search_strings.get(file_path)
+            if row is not None and search_string is not None:
+                set_row_hidden(row, needle not in search_string)
+
+    def _join_search_string(self, file_path, tags):
+        name = self._basename_lower_cache.get(file_path)
+        if name is None:
+            name = os.path.basename(file_path).lower()
+        title, artist, album = tags
+        return f"{title} {artist} {album} {name}"
+
+    def _remember_search_tags(self, tags_by_path):
+        # Guarda las etiquetas y el texto de búsqueda ya unido, para que cada tecla
+        # solo haga una comprobación "in" por fila. Solo se guardan las de canciones que siguen
+        # en la playlist: un lote de TagPrefetchWorker puede llegar después de eliminarlas
+        in_playlist = self._all_files_set
+        tags_by_path = {f: tags for f, tags in tags_by_path.items() if f in in_playlist}
+        self.meta_cache.update(tags_by_path)
+        join = self._join_search_string
+        self._search_strings.update((f, join(f, tags)) for f, tags in tags_by_path.items())
+
+    def _store_search_tags(self, tags_by_path):
+        # Etiquetas de TagPrefetchWorker (que ya las guardó en el índice): a la caché en memoria
+        self._remember_search_tags(tags_by_path)
+        self._refilter_rows(tags_by_path)
 
     def show_context_menu(self, position):
         menu = QMenu()
@@ -1858,26 +2764,7 @@ class MusicPlayer(QMainWindow):
         msg_box = QMessageBox(self)
         msg_box.setWindowTitle(title)
         msg_box.setText(message)
-        msg_box.setStyleSheet("""
-            QMessageBox {
-                background-color: #2b2b2b;
-                color: #ddd;
-                font-size: 14px;
-            }
-            QMessageBox QLabel {
-                color: #ddd;
-            }
-            QMessageBox QPushButton {
-                background: #333;
-                border: none;
-                border-radius: 5px;
-                padding: 5px 10px;
-                color: white;
-            }
-            QMessageBox QPushButton:hover {
-                background: #444;
-            }
-        """)
+        msg_box.setStyleSheet(_MESSAGE_BOX_STYLESHEET)
         msg_box.exec()
 
     def load_last_session_state(self):
@@ -1888,13 +2775,23 @@ class MusicPlayer(QMainWindow):
         if last_path and os.path.exists(last_path):
             print(f"Cargando la última ruta abierta: {last_path}")
             if os.path.isdir(last_path):
-                self.scan_folder_recursive(last_path)
+                # La canción se restaura cuando el escaneo en segundo plano termina
+                self.scan_folder_recursive(
+                    last_path, on_finished=lambda: self._restore_last_song(last_song, last_position))
+                return
             elif os.path.isfile(last_path):
                 self.add_files_to_playlist([last_path])
 
+        self._restore_last_song(last_song, last_position)
+
+    def _restore_last_song(self, last_song, last_position):
+        if self.current_playback_file:
+            # El usuario ya eligió una canción mientras se escaneaba la carpeta
+            print("DEBUG: _restore_last_song: Ya hay una canción cargada; no se restaura la sesión.")
+            return
         if last_song and os.path.exists(last_song):
-            if last_song in self.playlist:
-                self.current_index = self.playlist.index(last_song)
+            if last_song in self._all_files_set:
+                self.current_index = self._path_to_index[last_song]
                 self.track_list.setCurrentRow(self.current_index)
                 self.update_metadata(last_song)
                 self.update_position_ui(last_position)
@@ -1902,7 +2799,7 @@ class MusicPlayer(QMainWindow):
                 self.is_playing = False
                 self.load_and_play(last_song, start_position_ms=last_position, auto_start_playback=False)
                 self.update_playback_status_label("StoppedState")
-                self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+                self._set_play_icon(False)
             else:
                 print(f"Advertencia: La última canción '{last_song}' no se encontró en la playlist cargada.")
         elif self.playlist:
@@ -1913,7 +2810,7 @@ class MusicPlayer(QMainWindow):
             self.is_playing = False
             self.load_and_play(self.playlist[self.current_index], start_position_ms=0, auto_start_playback=False)
             self.update_playback_status_label("StoppedState")
-            self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+            self._set_play_icon(False)
             print(f"Seleccionada primera canción de la playlist: {os.path.basename(self.playlist[self.current_index])}")
         else:
             print("No se encontró ninguna canción ni playlist anterior para cargar.")
@@ -1934,6 +2831,9 @@ class MusicPlayer(QMainWindow):
 
     def closeEvent(self, event):
         print("Cerrando la aplicación. Deteniendo hilos de audio...")
+        if self._volume_save_timer.isActive(): # Guardar un cambio de volumen pendiente
+            self._volume_save_timer.stop()
+            self._save_volume()
         self.save_player_state_on_stop("application_closed")
         
         self.stop_playback(final_stop=True)
@@ -1943,6 +2843,22 @@ class MusicPlayer(QMainWindow):
             self.deviceWatcher.quit()
             self.deviceWatcher.wait(2000) # Espera hasta 2 segundos para que el hilo termine
 
+        # Soltar lo que sigue vivo fuera de esta ventana: el filtro de eventos instalado en la
+        # aplicación, los timers y las conexiones de las señales del hilo de audio
+        QApplication.instance().removeEventFilter(self)
+        self.ui_update_timer.stop()
+        self._filter_timer.stop()
+        self._cancel_scans()
+        if hasattr(self, 'device_check_timer'):
+            self.device_check_timer.stop()
+        for signal in (self.update_position_signal, self.update_duration_signal,
+                       self.update_playback_state_signal, self.update_visualizer_signal,
+                       self.audio_error_signal, self.restart_playback_signal):
+            try:
+                signal.disconnect()
+            except TypeError: # Sin conexiones
+                pass
+
         event.accept()
 
     def dragEnterEvent(self, event):
@@ -2084,7 +3000,9 @@ class MusicPlayer(QMainWindow):
 
         self.audio_stream = None
         self.current_playback_file = None
-        self.current_audio_data_original = None
+        self._stream_file = None # Archivo que lee por bloques el hilo de reproducción
+        self._file_channels = 0
+        self._file_frames = 0
         self._file_samplerate = 0
         self.audio_samplerate_output = 0
         self.audio_channels_original = 0
@@ -2117,18 +3035,35 @@ class MusicPlayer(QMainWindow):
         print(f"DEBUG: __init__: Ganancia maestra del ecualizador establecida a {self.eq_master_gain_db} dB ({self.eq_master_gain_factor:.2f} lineal).")
 
         print("DEBUG: __init__: Diseñando filtros de ecualizador iniciales...")
-        self.equalizer_filters = [self._design_band_filter(freq, 0) for freq in self._get_band_frequencies()]
-        print("DEBUG: __init__: Filtros del ecualizador diseñados.")
-        self.filter_states = []
-        print("DEBUG: __init__: Filter states inicializados.")
+        self._set_eq_filters([0.0] * len(self._get_band_frequencies()))
+        print("DEBUG: __init__: Filtros del ecualizador diseñados y estados inicializados.")
+        self._eq_dialog = None # Ventana del ecualizador, se crea en el primer uso y se reutiliza
 
         print("DEBUG: __init__: Configuración de dispositivos de audio completada.")
 
         self.playlist = []
         self.shuffled_playlist = []
+        self._shuffle_dirty = True # La lista aleatoria debe regenerarse antes de usarse
         self.current_index = -1
         self.current_shuffled_index = -1
         self.all_files = []
+        self._all_files_set = set() # Mismas rutas que all_files/playlist, para comprobar pertenencia en O(1)
+        self._path_to_index = {} # {ruta: fila en playlist/track_list}, evita playlist.index()
+        self._shuffled_pos = {} # {ruta: posición en shuffled_playlist}, evita shuffled_playlist.index()
+        self._basename_cache = {} # {ruta: nombre del archivo}, calculado al añadirlo a la playlist
+        self._basename_lower_cache = {} # {ruta: nombre del archivo en minúsculas}, para la búsqueda
+        self.meta_cache = {} # {ruta: (título, artista, álbum)} en minúsculas, para la búsqueda
+        self._search_strings = {} # {ruta: "título artista álbum nombre"} en minúsculas, ver filter_track_list
+        # Índice de la biblioteca: aquí solo se crea; TagPrefetchWorker y DurationWorker abren
+        # cada uno su propia conexión. None si no está disponible
+        self._library_db_path = _LIBRARY_DB_PATH
+        try:
+            BibliotecaEtiquetas(_LIBRARY_DB_PATH).cerrar()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Advertencia: No se pudo abrir el índice de la biblioteca, se usará solo la caché en memoria: {e}")
+            self._library_db_path = None
+        QPixmapCache.setCacheLimit(64 * 1024) # KB: carátulas escaladas reutilizadas al volver a una canción
+        self._scan_workers = [] # Escaneos de carpetas en curso (ScanWorker)
         print("DEBUG: __init__: Listas de reproducción inicializadas.")
 
         self._shuffle_mode = False
@@ -2148,7 +3083,12 @@ class MusicPlayer(QMainWindow):
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit(self)
         self.search_input.setPlaceholderText("Buscar título, artista o álbum...")
-        self.search_input.textChanged.connect(self.filter_track_list)
+        # Al escribir, el filtro espera a que se dejen de pulsar teclas (ver _on_search_text_changed)
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(150)
+        self._filter_timer.timeout.connect(self._apply_search_filter)
+        self.search_input.textChanged.connect(self._on_search_text_changed)
         self.search_input.setMinimumWidth(200)
         search_layout.addWidget(self.search_input)
 
@@ -2163,6 +3103,11 @@ class MusicPlayer(QMainWindow):
 
         self.track_list = QListWidget(self)
         self.track_list.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        # Todas las filas tienen la misma altura y el layout se hace por lotes, así la vista
+        # no mide cada elemento al cargar playlists grandes.
+        self.track_list.setUniformItemSizes(True)
+        self.track_list.setLayoutMode(QListWidget.LayoutMode.Batched)
+        self.track_list.setBatchSize(200)
         self.track_list.doubleClicked.connect(self.play_selected)
         self.track_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.track_list.customContextMenuRequested.connect(self.show_context_menu)
@@ -2178,6 +3123,11 @@ class MusicPlayer(QMainWindow):
         self.album_art.setFixedSize(300, 300)
         self.album_art.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.album_art.setText("No Album Art")
+        self._album_art_cleared = True # La etiqueta ya muestra el texto sin carátula
+        self._metadata_file = None # Archivo cuyos metadatos se muestran
+        self._metadata_request = 0 # Id de la última lectura pedida a MetadataWorker
+        self._metadata_worker = None # Esa lectura, mientras pueda seguir en la cola
+        self._metadata_art_key = None # Clave en QPixmapCache de la carátula de esa canción
 
         self.visualizer_widget = AudioVisualizerWidget(self)
         self.visualizer_widget.setObjectName("visualizerWidget")
@@ -2211,6 +3161,8 @@ class MusicPlayer(QMainWindow):
 
         time_layout = QHBoxLayout()
         self.lbl_elapsed = QLabel("00:00", self)
+        self._last_elapsed_s = 0 # Segundo mostrado en lbl_elapsed
+        self._last_duration_ms = 0 # Duración mostrada en lbl_duration y rango del slider
         self.slider = ClickableSlider(Qt.Orientation.Horizontal, self)
         self.slider.setRange(0, 0)
         self.slider.clicked_value_set.connect(self.seek_position_audio)
@@ -2225,39 +3177,52 @@ class MusicPlayer(QMainWindow):
 
         ctrl_layout = QHBoxLayout()
 
+        # Iconos de los controles, obtenidos del estilo una sola vez y reutilizados
+        # en cada cambio de estado de reproducción.
+        style = self.style()
+        self.icon_play = style.standardIcon(QStyle.StandardPixmap.SP_MediaPlay)
+        self.icon_pause = style.standardIcon(QStyle.StandardPixmap.SP_MediaPause)
+        icon_volume = style.standardIcon(QStyle.StandardPixmap.SP_MediaVolume)
+
         self.btn_prev = QPushButton(self)
-        self.btn_prev.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaSkipBackward))
+        self.btn_prev.setIcon(style.standardIcon(QStyle.StandardPixmap.SP_MediaSkipBackward))
         self.btn_prev.clicked.connect(self.prev_track)
 
         self.btn_play = QPushButton(self)
-        self.btn_play.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+        self.btn_play.setIcon(self.icon_play)
+        self._play_icon_is_pause = False
         self.btn_play.clicked.connect(self.toggle_play)
 
         self.btn_next = QPushButton(self)
-        self.btn_next.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaSkipForward))
+        self.btn_next.setIcon(style.standardIcon(QStyle.StandardPixmap.SP_MediaSkipForward))
         self.btn_next.clicked.connect(self.next_track)
 
+        self.icon_repeat_all = style.standardIcon(QStyle.StandardPixmap.SP_BrowserReload)
         self.btn_shuffle = QPushButton(self)
-        self.btn_shuffle.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_BrowserReload))
+        self.btn_shuffle.setIcon(self.icon_repeat_all) # Mismo icono que "repetir todo"
         self.btn_shuffle.setCheckable(True)
         self.btn_shuffle.clicked.connect(self.toggle_shuffle_mode)
 
         self.btn_repeat = QPushButton(self)
-        self.icon_repeat_off = self.style().standardIcon(QStyle.StandardPixmap.SP_DialogNoButton)
-        self.icon_repeat_single = self.style().standardIcon(QStyle.StandardPixmap.SP_DialogYesButton)
-        self.icon_repeat_all = self.style().standardIcon(QStyle.StandardPixmap.SP_BrowserReload)
+        self.icon_repeat_off = style.standardIcon(QStyle.StandardPixmap.SP_DialogNoButton)
+        self.icon_repeat_single = style.standardIcon(QStyle.StandardPixmap.SP_DialogYesButton)
         self.btn_repeat.setIcon(self.icon_repeat_off)
         self.btn_repeat.clicked.connect(self.toggle_repeat_mode)
 
         self.vol_slider = ClickableSlider(Qt.Orientation.Horizontal, self)
         self.vol_slider.setRange(0, 100)
         last_volume = self.settings.value("last_volume", 50, type=int)
+        self._volume_linear = last_volume / 100.0 # Volumen que aplica el hilo de audio
+        self._volume_save_timer = QTimer(self)
+        self._volume_save_timer.setSingleShot(True)
+        self._volume_save_timer.setInterval(300)
+        self._volume_save_timer.timeout.connect(self._save_volume)
         self.vol_slider.setValue(last_volume)
         self.vol_slider.valueChanged.connect(self.set_and_save_volume)
         self.vol_slider.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
 
         self.btn_volume_menu = QToolButton(self)
-        self.btn_volume_menu.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaVolume))
+        self.btn_volume_menu.setIcon(icon_volume)
         self.btn_volume_menu.setPopupMode(QToolButton.ToolButtonPopupMode.InstantPopup)
 
         self.volume_menu = QMenu(self)
@@ -2275,7 +3240,7 @@ class MusicPlayer(QMainWindow):
 
         self.btn_equalizer = QPushButton(self)
         self.btn_equalizer.setText("Ecualizador")
-        self.btn_equalizer.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaVolume))
+        self.btn_equalizer.setIcon(icon_volume)
         self.btn_equalizer.clicked.connect(self.open_equalizer_window)
 
         self.btn_menu_file = QToolButton(self)
@@ -2335,12 +3300,15 @@ class MusicPlayer(QMainWindow):
         layout.addLayout(ctrl_layout)
         print("DEBUG: __init__: Controles de reproducción configurados.")
 
-        self.update_position_signal.connect(self.update_position_ui)
-        self.update_duration_signal.connect(self.update_duration_ui)
-        self.update_playback_state_signal.connect(self.update_playback_status_label)
-        self.update_visualizer_signal.connect(self.visualizer_widget.update_visualization_data)
-        self.audio_error_signal.connect(self._handle_audio_error_in_ui)
-        self.restart_playback_signal.connect(self._delayed_restart_playback)
+        # Señales emitidas desde el hilo de audio. UniqueConnection evita que un mismo slot
+        # quede conectado dos veces y se ejecute por duplicado en cada emisión.
+        unique = Qt.ConnectionType.UniqueConnection
+        self.update_position_signal.connect(self.update_position_ui, unique)
+        self.update_duration_signal.connect(self.update_duration_ui, unique)
+        self.update_playback_state_signal.connect(self.update_playback_status_label, unique)
+        self.update_visualizer_signal.connect(self.visualizer_widget.update_visualization_data, unique)
+        self.audio_error_signal.connect(self._handle_audio_error_in_ui, unique)
+        self.restart_playback_signal.connect(self._delayed_restart_playback, unique)
         # Connect the new system audio device changed signal
         if IS_WINDOWS_COM_AVAILABLE:
             self.deviceWatcher = AudioDeviceWatcherThread()
@@ -2352,7 +3320,9 @@ class MusicPlayer(QMainWindow):
 
 
         self.ui_update_timer = QTimer(self)
-        self.ui_update_timer.setInterval(100)
+        self.ui_update_timer.setInterval(self.UI_UPDATE_INTERVAL_MS)
+        # Un timer "coarse" permite a Qt agrupar este despertar con otros (±5 %)
+        self.ui_update_timer.setTimerType(Qt.TimerType.CoarseTimer)
         self.ui_update_timer.timeout.connect(self._update_ui_from_threads)
         print("DEBUG: __init__: Señales de UI y timer configurados.")
 